@@ -0,0 +1,101 @@
+import re
+import sys
+
+# Common spellings of street suffixes and directions, mapped to their USPS abbreviation
+ABBREVIATIONS = {
+    'street': 'st',
+    'avenue': 'ave',
+    'av': 'ave',
+    'road': 'rd',
+    'drive': 'dr',
+    'boulevard': 'blvd',
+    'lane': 'ln',
+    'court': 'ct',
+    'place': 'pl',
+    'parkway': 'pkwy',
+    'circle': 'cir',
+    'highway': 'hwy',
+    'freeway': 'fwy',
+    'terrace': 'ter',
+    'trail': 'trl',
+    'square': 'sq',
+    'north': 'n',
+    'south': 's',
+    'east': 'e',
+    'west': 'w',
+    'northeast': 'ne',
+    'northwest': 'nw',
+    'southeast': 'se',
+    'southwest': 'sw',
+}
+
+# Periods and apostrophes are dropped ("St." -> "st"), other punctuation separates words ("12-B" -> "12 b")
+DROPPED_PUNCTUATION_REGEX = re.compile(r"[.']")
+SEPARATING_PUNCTUATION_REGEX = re.compile(r"[^\w\s]|_")
+
+
+def normalize_address(raw_address):
+    """Normalizes the case, whitespace, punctuation and street suffixes of an address
+
+    @param raw_address The address as typed in the form
+    @return The canonical address, e.g. "123 main st" for "123  Main Street."
+    """
+    address = SEPARATING_PUNCTUATION_REGEX.sub(' ', DROPPED_PUNCTUATION_REGEX.sub('', raw_address.lower()))
+
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in address.split())
+
+
+class AddressIndex:
+    """Canonical keys and file name slugs of raw addresses
+
+    Each distinct spelling is only normalized once, and every spelling of the same address shares a
+    single interned key.
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._slugs = {}
+
+    def key(self, raw_address):
+        """Looks up the canonical key of an address
+
+        @param raw_address The address as typed in the form
+        @return The canonical key, empty if the address has no words
+        """
+        key = self._keys.get(raw_address)
+        if key is None:
+            key = self._keys[raw_address] = sys.intern(normalize_address(raw_address))
+
+        return key
+
+    def slug(self, raw_address):
+        """Looks up the file name slug of an address, shared by every spelling of it
+
+        @param raw_address Any spelling of the address
+        @return The slug, e.g. "123_main_st"
+        """
+        key = self.key(raw_address)
+
+        slug = self._slugs.get(key)
+        if slug is None:
+            slug = self._slugs[key] = key.replace(' ', '_')
+
+        return slug
+
+
+# Index shared by the whole process, so each spelling is normalized once per run
+_index = AddressIndex()
+
+
+def canonical_address(raw_address):
+    return _index.key(raw_address)
+
+
+def address_slug(raw_address):
+    return _index.slug(raw_address)
+
+
+def reset():
+    """Forgets every spelling normalized so far, e.g. between benchmark runs"""
+    global _index
+    _index = AddressIndex()
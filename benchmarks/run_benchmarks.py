@@ -0,0 +1,188 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Append the root directory to the system path
+sys.path.append(os.path.abspath(os.path.dirname(__file__) + "/../"))
+import address_index
+import report_generator
+import service
+
+import synthetic_data
+
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+STAGES = [
+    'format_responses',
+    'group_responses_by_address',
+    'compress_grouped_responses',
+    'generate_reports',
+    'write_grouped_resps_to_disk',
+    'write_reports_to_disk',
+]
+
+
+def run_pipeline(responses_wks, output_directory, measure):
+    """Runs every stage of the pipeline through `measure(stage name, func, *args)`"""
+    formatted_resps = measure('format_responses', report_generator.format_responses, responses_wks)
+    grouped_resps = measure('group_responses_by_address', report_generator.group_responses_by_address, formatted_resps)
+    compressed_resps = measure('compress_grouped_responses', report_generator.compress_grouped_responses, grouped_resps)
+    reports = measure('generate_reports', report_generator.generate_reports, grouped_resps, compressed_resps)
+
+    measure(
+        'write_grouped_resps_to_disk', report_generator.write_grouped_resps_to_disk,
+        grouped_resps, os.path.join(output_directory, "grouped_responses"),
+    )
+    measure(
+        'write_reports_to_disk', report_generator.write_reports_to_disk,
+        reports, compressed_resps, os.path.join(output_directory, "reports"),
+    )
+
+
+def benchmark(rows, measure_memory=True, repeat=1):
+    """Times and memory-profiles each stage of the pipeline
+
+    Timings and peak memory are measured in separate runs, as tracing allocations slows the stages down.
+    The fastest of the timed runs is kept, as slower runs mostly measure the noise of the machine.
+
+    @param rows The worksheet values, including the header row
+    @param measure_memory Whether to also measure the peak memory of each stage
+    @param repeat The number of timed runs of the pipeline
+    @return Dictionary mapping stage name to its measurements
+    """
+    results = dict((stage, {}) for stage in STAGES)
+
+    def time_stage(stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+        results[stage]['seconds'] = min(seconds, results[stage].get('seconds', seconds))
+        return result
+
+    def trace_stage(stage, func, *args):
+        tracemalloc.start()
+        try:
+            result = func(*args)
+            results[stage]['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result
+
+    with tempfile.TemporaryDirectory() as output_directory:
+        for run in range(repeat):
+            # Every run starts from an empty address index, as a fresh process would
+            address_index.reset()
+            run_pipeline(service.LocalWorksheet(rows), os.path.join(output_directory, "timed_%d" % run), time_stage)
+
+        if measure_memory:
+            address_index.reset()
+            run_pipeline(service.LocalWorksheet(rows), os.path.join(output_directory, "traced"), trace_stage)
+
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold, min_seconds=0.005):
+    """Lists the stages that got slower than their baseline
+
+    @param results The results of this run, by size and then stage
+    @param baseline The saved baseline results, by size and then stage
+    @param threshold The slowdown ratio above which a stage is reported
+    @param min_seconds Slowdowns smaller than this are considered noise
+    @return List of (size, stage, baseline seconds, seconds) tuples
+    """
+    regressions = []
+    for size, stages in sorted(results.items(), key=lambda item: int(item[0])):
+        for stage, measurements in stages.items():
+            baseline_seconds = baseline.get(size, {}).get(stage, {}).get('seconds')
+            if baseline_seconds is None:
+                continue
+
+            seconds = measurements['seconds']
+            if seconds > baseline_seconds * threshold and seconds - baseline_seconds > min_seconds:
+                regressions.append((size, stage, baseline_seconds, seconds))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the report generator on synthetic worksheets")
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+        help="numbers of responses to benchmark, e.g. 1000 10000 100000 1000000",
+    )
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic data generator")
+    parser.add_argument('--no-memory', action='store_true', help="only measure the stage timings")
+    parser.add_argument('--repeat', type=int, default=5, help="number of timed runs, the fastest is kept")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help="path of the baseline results")
+    parser.add_argument('--save-baseline', action='store_true', help="save the results as the new baseline")
+    parser.add_argument(
+        '--threshold', type=float, default=1.25,
+        help="slowdown ratio against the baseline that is reported as a regression",
+    )
+    parser.add_argument('--output', default=None, help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # Benchmarks run fully offline against in-memory worksheets
+    service.configure(
+        config={'forms_version': 'V1', 'main_spreadsheet': {'id': 'benchmark', 'name': 'Benchmark'}},
+        backend=lambda: service.LocalClient([]),
+    )
+
+    # The synthetic sheets purposely contain responses without an address
+    logging.getLogger("das-care-contact-forms-logger").setLevel(logging.ERROR)
+
+    results = {}
+    for size in args.sizes:
+        rows = synthetic_data.generate_v1_sheet(size, seed=args.seed)
+        results[str(size)] = benchmark(rows, measure_memory=not args.no_memory, repeat=args.repeat)
+
+        for stage in STAGES:
+            measurements = results[str(size)][stage]
+            print("{size:>8} {stage:<30} {seconds:>9.4f}s {peak}".format(
+                size=size,
+                stage=stage,
+                seconds=measurements['seconds'],
+                peak="{0:>10.1f} MiB".format(measurements['peak_bytes'] / 2 ** 20) if 'peak_bytes' in measurements else "",
+            ))
+
+    output = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(json.dumps(output, indent=2, sort_keys=True))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            baseline_file.write(json.dumps(output, indent=2, sort_keys=True) + "\n")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+
+    with open(args.baseline, 'r') as baseline_file:
+        baseline = json.loads(baseline_file.read())
+
+    regressions = compare_to_baseline(results, baseline['results'], args.threshold)
+    for size, stage, baseline_seconds, seconds in regressions:
+        print("REGRESSION {size} {stage}: {baseline:.4f}s -> {seconds:.4f}s".format(
+            size=size, stage=stage, baseline=baseline_seconds, seconds=seconds,
+        ))
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
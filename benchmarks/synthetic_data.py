@@ -0,0 +1,96 @@
+import datetime
+import random
+
+
+V1_HEADER = [
+    'Timestamp',
+    'Street Address',
+    'Date of Contact',
+    'Type of Contact',
+    'Census Tract',
+    'How many dogs do they have?',
+    'How many cats do they have?',
+    'Are there any indicators of animals?',
+    'Name',
+    'Phone',
+    'Email',
+    'Spayed/Neutered?',
+    'Vaccinated?',
+    'Registered?',
+    'Compliance?',
+]
+
+CONTACT_TYPES = ['Initial Contact', 'C.A.R.E. Letter', 'Phone Call', 'Mail/Email']
+STREET_NAMES = ['Main', 'Elm', 'Oak', 'Ervay', 'Akard', 'Lamar', 'Riverfront', 'Hatcher', 'Pennsylvania', 'Malcolm X']
+STREET_SUFFIXES = ['St', 'Ave', 'Blvd', 'Dr', 'Ln']
+INDICATORS = ['Dog bowl', 'Barking', 'Fenced yard', 'Cat on porch', 'Leash on fence']
+
+
+def _format_timestamp(timestamp, with_time=True):
+    date = "{0}/{1}/{2}".format(timestamp.month, timestamp.day, timestamp.year)
+    if not with_time:
+        return date
+
+    return "{0} {1:02d}:{2:02d}:{3:02d}".format(date, timestamp.hour, timestamp.minute, timestamp.second)
+
+
+def generate_v1_sheet(num_rows, seed=0, empty_cell_rate=0.3, missing_address_rate=0.005):
+    """Generates the values of a realistic V1 responses worksheet
+
+    Addresses are reused with a skewed distribution, so a few addresses get many contacts while most
+    get one or two, like the real sheets.
+
+    @param num_rows The number of responses, excluding the header row
+    @param seed Seed of the random generator, the same seed always generates the same sheet
+    @param empty_cell_rate Probability that an optional cell is left empty
+    @param missing_address_rate Probability that a response has no address and is dropped
+    @return List of rows, the first being the header row
+    """
+    rng = random.Random(seed)
+
+    num_addresses = max(1, num_rows // 3)
+    census_tracts = ["{0}.{1:02d}".format(rng.randint(1, 200), rng.randint(0, 99)) for _ in range(max(1, num_addresses // 50))]
+
+    timestamp = datetime.datetime(2016, 10, 1, 8, 0, 0)
+    rows = [list(V1_HEADER)]
+    for _ in range(num_rows):
+        # Responses are submitted in order, a few minutes apart
+        timestamp += datetime.timedelta(seconds=rng.randint(30, 1800))
+
+        # Skew the address reuse towards the low indices
+        address_idx = int(num_addresses * rng.random() ** 3)
+        address = "{0} {1} {2}".format(
+            100 + address_idx,
+            STREET_NAMES[address_idx % len(STREET_NAMES)],
+            STREET_SUFFIXES[(address_idx // len(STREET_NAMES)) % len(STREET_SUFFIXES)],
+        )
+        if rng.random() < missing_address_rate:
+            address = ''
+
+        # Contacts are often recorded some days after they were made
+        date_of_contact = timestamp - datetime.timedelta(days=rng.randint(0, 14))
+
+        optional = lambda value: '' if rng.random() < empty_cell_rate else value
+        num_dogs = rng.randint(0, 3)
+        num_cats = rng.randint(0, 3)
+        num_animals = num_dogs + num_cats
+
+        rows.append([
+            _format_timestamp(timestamp),
+            address,
+            _format_timestamp(date_of_contact, with_time=False),
+            rng.choice(CONTACT_TYPES),
+            census_tracts[address_idx % len(census_tracts)],
+            optional(str(num_dogs)),
+            optional(str(num_cats)),
+            optional(rng.choice(INDICATORS)),
+            optional("Owner {0}".format(address_idx)),
+            optional("214-555-{0:04d}".format(address_idx % 10000)),
+            optional("owner{0}@example.com".format(address_idx)),
+            optional(str(rng.randint(0, num_animals))),
+            optional(str(rng.randint(0, num_animals))),
+            optional(str(rng.randint(0, num_animals))),
+            optional(rng.choice(['Yes', 'No'])),
+        ])
+
+    return rows
@@ -0,0 +1,194 @@
+import csv
+import datetime
+import gzip
+import json
+import logging
+import os
+
+logger = logging.getLogger("das-care-contact-forms-logger")
+
+# Large buffers turn the many small row writes into few sequential writes
+BUFFER_SIZE = 1024 * 1024
+
+RESPONSE_RECORD = 'response'
+COMPRESSED_RECORD = 'compressed'
+LEADING_COLUMNS = ['record_type', 'address']
+
+
+################
+# HELPER FUNCS #
+################
+
+def _open_output(path, compress):
+    """Opens an export file for writing
+
+    @param path The path of the file
+    @param compress Whether the file is gzip-compressed
+    @return The text file
+    """
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+
+    return open(path, 'w', encoding='utf-8', newline='', buffering=BUFFER_SIZE)
+
+
+def export_columns(grouped_resps, compressed_grouped_resps):
+    """Lists the fields of the exported records in a stable order
+
+    Records sharing a schema only contribute its fields once.
+
+    @param grouped_resps Responses grouped by address
+    @param compressed_grouped_resps Compressed responses of each address
+    @return Sorted list of field names
+    """
+    fields = set()
+    seen_schemas = set()
+    for resps in list(grouped_resps.values()) + [list(compressed_grouped_resps.values())]:
+        for resp in resps:
+            schema = getattr(resp, 'schema', None)
+            if schema is None:
+                fields.update(resp.keys())
+            elif id(schema) not in seen_schemas:
+                seen_schemas.add(id(schema))
+                fields.update(schema.fields)
+
+    return sorted(fields)
+
+
+class BulkExporter:
+    """Writes grouped and compressed responses to a single JSON Lines and/or CSV file
+
+    Every row holds a `record_type`, `response` or `compressed`, and the `address`, followed by the
+    fields in a fixed column order. Dates are serialized once and reused for every record sharing them.
+    Files are written under a temporary name and renamed once complete.
+    """
+
+    def __init__(self, columns, jsonl_path=None, csv_path=None):
+        """
+        @param columns The field names, in column order
+        @param jsonl_path Where the JSON Lines export is written, gzip-compressed if it ends with `.gz`
+        @param csv_path Where the CSV export is written, gzip-compressed if it ends with `.gz`
+        """
+        self.columns = list(columns)
+        self.num_records = 0
+
+        self._serialized_dates = {}
+        self._column_indices_by_schema = {}
+        self._outputs = []
+        self._jsonl_file = None
+        self._csv_writer = None
+
+        if jsonl_path:
+            self._jsonl_file = self._open(jsonl_path)
+        if csv_path:
+            self._csv_writer = csv.writer(self._open(csv_path))
+            self._csv_writer.writerow(LEADING_COLUMNS + self.columns)
+
+    def _open(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = os.path.join(os.path.dirname(path), ".{0}.{1}.tmp".format(os.path.basename(path), os.getpid()))
+        output_file = _open_output(tmp_path, compress=path.endswith('.gz'))
+        self._outputs.append((output_file, tmp_path, path))
+
+        return output_file
+
+    def _serialize(self, value):
+        if isinstance(value, datetime.datetime):
+            serialized = self._serialized_dates.get(value)
+            if serialized is None:
+                serialized = self._serialized_dates[value] = value.isoformat()
+
+            return serialized
+
+        return value
+
+    def _values(self, resp):
+        """Lists the values of a record in column order, resolving the columns once per schema"""
+        schema = getattr(resp, 'schema', None)
+        if schema is None:
+            return [self._serialize(resp.get(field)) for field in self.columns]
+
+        cached = self._column_indices_by_schema.get(id(schema))
+        if cached is None:
+            # The schema is kept alongside its indices so its id is not reused while cached
+            cached = self._column_indices_by_schema[id(schema)] = (
+                schema, [schema.index.get(field) for field in self.columns],
+            )
+
+        record_values = resp.values
+        num_values = len(record_values)
+        return [
+            self._serialize(record_values[idx]) if idx is not None and idx < num_values else None
+            for idx in cached[1]
+        ]
+
+    def _write_record(self, record_type, address, resp):
+        values = self._values(resp)
+
+        if self._jsonl_file is not None:
+            record = {'record_type': record_type, 'address': address}
+            for field, value in zip(self.columns, values):
+                if value is not None:
+                    record[field] = value
+
+            self._jsonl_file.write(json.dumps(record, ensure_ascii=False))
+            self._jsonl_file.write('\n')
+
+        if self._csv_writer is not None:
+            self._csv_writer.writerow([record_type, address] + ['' if value is None else value for value in values])
+
+        self.num_records += 1
+
+    def write_address(self, address, resps, compressed_resp):
+        """Writes the responses of an address followed by its compressed response
+
+        @param address The address
+        @param resps The responses of the address, sorted by timestamp
+        @param compressed_resp The compressed response of the address
+        """
+        for resp in resps:
+            self._write_record(RESPONSE_RECORD, address, resp)
+
+        self._write_record(COMPRESSED_RECORD, address, compressed_resp)
+
+    def close(self, complete=True):
+        """Closes the export files
+
+        @param complete Whether the files are renamed to their final path, they are removed otherwise
+        """
+        for output_file, tmp_path, path in self._outputs:
+            output_file.close()
+            if complete:
+                os.replace(tmp_path, path)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self._outputs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(complete=exc_type is None)
+
+
+def export_responses(grouped_resps, compressed_grouped_resps, jsonl_path=None, csv_path=None):
+    """Exports every grouped and compressed response in a single pass
+
+    @param grouped_resps Responses grouped by address and sorted by timestamp
+    @param compressed_grouped_resps Compressed responses of each address
+    @param jsonl_path Where the JSON Lines export is written, gzip-compressed if it ends with `.gz`
+    @param csv_path Where the CSV export is written, gzip-compressed if it ends with `.gz`
+    @return The number of records exported
+    """
+    columns = export_columns(grouped_resps, compressed_grouped_resps)
+
+    with BulkExporter(columns, jsonl_path, csv_path) as exporter:
+        for address, resps in grouped_resps.items():
+            exporter.write_address(address, resps, compressed_grouped_resps[address])
+
+    logger.info("Exported %d records" % exporter.num_records)
+
+    return exporter.num_records
@@ -0,0 +1,25 @@
+import concurrent.futures
+import logging
+
+logger = logging.getLogger("das-care-contact-forms-logger")
+
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+def fetch_all(sources, fetch, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Fetches several worksheets concurrently
+
+    The total time is close to the slowest single fetch instead of the sum of all of them.
+
+    @param sources List of (spreadsheet id, worksheet index or title) tuples
+    @param fetch Function fetching a single source, called with the spreadsheet id and worksheet
+    @param max_in_flight The maximum number of fetches running at once
+    @return List of the fetched worksheets, in the order of `sources`
+    """
+    if len(sources) <= 1 or max_in_flight <= 1:
+        return [fetch(*source) for source in sources]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_in_flight, len(sources))) as executor:
+        futures = [executor.submit(fetch, *source) for source in sources]
+
+        return [future.result() for future in futures]
@@ -0,0 +1,117 @@
+import bisect
+import datetime
+
+
+CONTACT_TYPES = ('Initial Contact', 'C.A.R.E. Letter', 'Phone Call', 'Mail/Email')
+
+
+class AddressContacts:
+    """Contact dates of a single address, bucketed by type of contact"""
+
+    __slots__ = ('contacts_by_type', 'first_contact', 'last_contact', 'num_contacts')
+
+    def __init__(self):
+        self.contacts_by_type = {}
+        self.first_contact = None
+        self.last_contact = None
+        self.num_contacts = 0
+
+    def add(self, contact_type, date_of_contact, timestamp):
+        # Contacts are kept ordered by date of contact and then timestamp, like grouped responses
+        bisect.insort(self.contacts_by_type.setdefault(contact_type, []), (date_of_contact, timestamp))
+
+        if self.first_contact is None or date_of_contact < self.first_contact:
+            self.first_contact = date_of_contact
+        if self.last_contact is None or date_of_contact > self.last_contact:
+            self.last_contact = date_of_contact
+
+        self.num_contacts += 1
+
+
+class ContactHistory:
+    """Index of the contacts made with each address"""
+
+    def __init__(self):
+        self._contacts = {}
+
+    @classmethod
+    def from_grouped_responses(cls, grouped_resps):
+        """Builds the history of already grouped responses
+
+        @param grouped_resps Dictionary mapping address to all entries from that address
+        @return A `ContactHistory`
+        """
+        history = cls()
+        for address, resps in grouped_resps.items():
+            for resp in resps:
+                history.add(address, resp)
+
+        return history
+
+    def add(self, address, resp):
+        """Records the contact of a formatted response
+
+        @param address The address the response belongs to
+        @param resp The formatted response
+        """
+        if address not in self._contacts:
+            self._contacts[address] = AddressContacts()
+
+        self._contacts[address].add(resp.get('Type of Contact'), resp['Date of Contact'], resp['Timestamp'])
+
+    def discard(self, address):
+        """Forgets the contacts of an address, e.g. before its responses are added again"""
+        self._contacts.pop(address, None)
+
+    def __contains__(self, address):
+        return address in self._contacts
+
+    def addresses(self):
+        return self._contacts.keys()
+
+    def dates(self, address, contact_type):
+        """Dates of contact of a given type, oldest first
+
+        @param address The address to look up
+        @param contact_type One of `CONTACT_TYPES`
+        @return List of `datetime` objects
+        """
+        contacts = self._contacts.get(address)
+        if contacts is None:
+            return []
+
+        return [date_of_contact for date_of_contact, _ in contacts.contacts_by_type.get(contact_type, [])]
+
+    def first_contact(self, address):
+        return self._contacts[address].first_contact
+
+    def last_contact(self, address):
+        return self._contacts[address].last_contact
+
+    def counts(self, address):
+        """Number of contacts of each type made with an address
+
+        @param address The address to look up
+        @return Dictionary mapping type of contact to the number of contacts
+        """
+        return dict(
+            (contact_type, len(contacts))
+            for contact_type, contacts in self._contacts[address].contacts_by_type.items()
+        )
+
+    def num_contacts(self, address):
+        return self._contacts[address].num_contacts
+
+    def stale_addresses(self, days, as_of=None):
+        """Addresses whose last contact is older than a number of days, i.e. those due for a follow up
+
+        @param days The number of days after which a contact is stale
+        @param as_of The reference time, defaults to now
+        @return List of addresses, least recently contacted first
+        """
+        cutoff = (as_of or datetime.datetime.now()) - datetime.timedelta(days=days)
+
+        return sorted(
+            (address for address, contacts in self._contacts.items() if contacts.last_contact < cutoff),
+            key=lambda address: (self._contacts[address].last_contact, address),
+        )
@@ -0,0 +1,183 @@
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def write_file_atomically(file_path, content):
+    """Writes a file through a temporary file and a rename, so readers never see a partial file
+
+    @param file_path The path of the file to write
+    @param content The text or bytes to write
+    """
+    tmp_path = os.path.join(
+        os.path.dirname(file_path),
+        ".{0}.{1}-{2}.tmp".format(os.path.basename(file_path), os.getpid(), threading.get_ident()),
+    )
+
+    try:
+        with open(tmp_path, 'wb' if isinstance(content, bytes) else 'w') as tmp_file:
+            tmp_file.write(content)
+
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_files(files, max_workers=DEFAULT_MAX_WORKERS):
+    """Writes many small files from a thread pool
+
+    @param files Dictionary mapping file path to content
+    @param max_workers The number of files written concurrently
+    """
+    # Create every directory once up front instead of checking before each write
+    for directory in set(os.path.dirname(file_path) for file_path in files):
+        os.makedirs(directory, exist_ok=True)
+
+    if max_workers <= 1 or len(files) <= 1:
+        for file_path, content in files.items():
+            write_file_atomically(file_path, content)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Consume the results so that write errors are raised
+        list(executor.map(lambda item: write_file_atomically(*item), files.items()))
+
+
+############
+# MANIFEST #
+############
+
+MANIFEST_FILE_NAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+WriteSummary = collections.namedtuple('WriteSummary', ['written', 'skipped', 'removed', 'bytes_written'])
+
+
+def merge_summaries(summaries):
+    """Adds up write summaries field by field"""
+    return WriteSummary(*(sum(values) for values in zip(WriteSummary(0, 0, 0, 0), *summaries)))
+
+
+class Manifest:
+    """Content hashes of the files written to an output directory, keyed by what each file describes
+
+    Files whose content did not change are not rewritten, and files that no longer belong to any key
+    or whose key moved to another path are removed.
+    """
+
+    def __init__(self, directory, defer_removals=False):
+        """
+        @param directory The output directory
+        @param defer_removals Whether the old files of keys that moved are only collected in
+                              `deferred_removals` instead of being removed, e.g. in worker processes
+                              sharing the directory, where removing them could race with another worker
+                              creating the same census tract directory
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_FILE_NAME)
+        self.entries = {}
+        self.defer_removals = defer_removals
+        self.deferred_removals = []
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as manifest_file:
+                manifest = json.loads(manifest_file.read())
+
+            if manifest.get('version') == MANIFEST_VERSION:
+                self.entries = manifest['files']
+
+    def _remove(self, rel_path):
+        file_path = os.path.join(self.directory, rel_path)
+        if not os.path.exists(file_path):
+            return 0
+
+        os.remove(file_path)
+
+        # Drop directories left empty, e.g. when the last address of a census tract moved away
+        parent_directory = os.path.dirname(file_path)
+        if os.path.abspath(parent_directory) != os.path.abspath(self.directory) and not os.listdir(parent_directory):
+            os.rmdir(parent_directory)
+
+        return 1
+
+    def write(self, files, max_workers=DEFAULT_MAX_WORKERS):
+        """Writes the files whose content changed since they were last written
+
+        @param files Dictionary mapping key to (path relative to the directory, text or bytes content)
+        @param max_workers The number of files written concurrently
+        @return A `WriteSummary`
+        """
+        to_write = {}
+        skipped = 0
+        removed = 0
+        bytes_written = 0
+
+        for key, (rel_path, content) in files.items():
+            encoded_content = content if isinstance(content, bytes) else content.encode('utf-8')
+            content_hash = hashlib.sha1(encoded_content).hexdigest()
+
+            entry = self.entries.get(key)
+            if entry is not None:
+                old_rel_path, old_hash = entry
+
+                if old_rel_path != rel_path:
+                    if self.defer_removals:
+                        self.deferred_removals.append(old_rel_path)
+                    else:
+                        removed += self._remove(old_rel_path)
+                elif old_hash == content_hash and os.path.exists(os.path.join(self.directory, rel_path)):
+                    skipped += 1
+                    continue
+
+            to_write[os.path.join(self.directory, rel_path)] = content
+            bytes_written += len(encoded_content)
+            self.entries[key] = [rel_path, content_hash]
+
+        write_files(to_write, max_workers=max_workers)
+
+        return WriteSummary(len(to_write), skipped, removed, bytes_written)
+
+    def prune(self, keys):
+        """Removes the files of every key not in `keys`
+
+        @param keys The keys whose files are kept
+        @return The number of files removed
+        """
+        keys = set(keys)
+        stale_keys = [key for key in self.entries if key not in keys]
+
+        # A stale key may share its path with a kept one, e.g. after keys were renamed
+        kept_paths = set(rel_path for key, (rel_path, _) in self.entries.items() if key in keys)
+
+        removed = 0
+        for key in stale_keys:
+            rel_path = self.entries.pop(key)[0]
+            if rel_path not in kept_paths:
+                removed += self._remove(rel_path)
+
+        return removed
+
+    def remove_deferred(self, rel_paths):
+        """Removes the old files of keys that moved, as collected by deferring managers
+
+        @param rel_paths The paths relative to the directory, those still written for a key are kept
+        @return The number of files removed
+        """
+        owned_paths = set(rel_path for rel_path, _ in self.entries.values())
+
+        return sum(self._remove(rel_path) for rel_path in set(rel_paths) if rel_path not in owned_paths)
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        write_file_atomically(
+            self.path,
+            json.dumps({'version': MANIFEST_VERSION, 'files': self.entries}, sort_keys=True),
+        )
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import time
+
+import address_index
+import metrics
+import normalizers
+import paged_reader
+import report_generator
+import tract_rollups
+
+logger = logging.getLogger("das-care-contact-forms-logger")
+
+STATE_VERSION = 3
+
+# Only appended rows are picked up between full rebuilds, so edits to older rows wait for the next one
+DEFAULT_REBUILD_INTERVAL = 24 * 60 * 60
+
+
+################
+# HELPER FUNCS #
+################
+
+def _trim_row(row):
+    """Strips trailing empty cells, which the Sheets API omits from ranged reads"""
+    row = list(row)
+    while row and row[-1] == '':
+        row.pop()
+
+    return row
+
+
+def load_state(state_path):
+    """Loads the state saved by the previous incremental run
+
+    @param state_path The path of the state file
+    @return The saved state, or `None` if there is no usable state
+    """
+    if not os.path.exists(state_path):
+        return None
+
+    with open(state_path, 'r') as state_file:
+        state = json.loads(state_file.read())
+
+    if state.get('version') != STATE_VERSION:
+        logger.warning("Ignoring incremental state with unknown version: %s" % state.get('version'))
+        return None
+
+    return state
+
+
+def save_state(state, state_path):
+    """Atomically saves the incremental state so a crash never leaves a partial file
+
+    @param state The state to save
+    @param state_path The path of the state file
+    """
+    tmp_path = "{0}.tmp".format(state_path)
+    with open(tmp_path, 'w') as state_file:
+        state_file.write(json.dumps(state))
+
+    os.replace(tmp_path, state_path)
+
+
+#########################
+# INCREMENTAL SYNC FUNC #
+#########################
+
+def fetch_new_rows(responses_wks, state, page_size=paged_reader.DEFAULT_PAGE_SIZE):
+    """Fetches the rows appended to the worksheet since the state was saved
+
+    @param responses_wks The worksheet to load data from
+    @param state The state saved by the previous run
+    @param page_size The number of rows fetched per request
+    @return (schema, new rows, whether a full rebuild is needed)
+    """
+    schema = responses_wks.row_values(1)
+
+    if state is None or state['schema'] != schema:
+        return schema, paged_reader.PagedReader(responses_wks, page_size).read(), True
+
+    # Re-read the watermark row to detect rows removed or inserted above it. Edits to rows above the
+    # watermark are not detected, they are picked up by the next full rebuild
+    watermark_row = state['row_count'] + 1
+    if state['row_count'] == 0:
+        return schema, paged_reader.PagedReader(responses_wks, page_size).read(), False
+
+    rows = paged_reader.PagedReader(responses_wks, page_size, first_row=watermark_row).read()
+    if not rows or _trim_row(rows[0]) != _trim_row(state['last_row']):
+        logger.warning("Responses above the sync watermark changed, rebuilding all reports")
+        metrics.count('full_rebuilds')
+        return schema, paged_reader.PagedReader(responses_wks, page_size).read(), True
+
+    return schema, rows[1:], False
+
+
+def sync(
+    responses_wks,
+    state_path,
+    grouped_directory=os.path.abspath("./grouped_responses/"),
+    reports_directory=os.path.abspath("./reports/reports_by_address/"),
+    tract_summary_path=tract_rollups.DEFAULT_SUMMARY_PATH,
+    forms_version=None,
+    page_size=paged_reader.DEFAULT_PAGE_SIZE,
+    full_rebuild=False,
+    rebuild_interval=DEFAULT_REBUILD_INTERVAL,
+):
+    """Regenerates the reports of only the addresses touched since the last sync
+
+    @param responses_wks The worksheet to load data from
+    @param state_path Where the sync state is kept between runs
+    @param grouped_directory Where the grouped responses are written
+    @param reports_directory Where the reports are written
+    @param tract_summary_path Where the census tract totals are written
+    @param forms_version The name of the forms version of the worksheet, defaults to the config's
+    @param page_size The number of rows fetched per request
+    @param full_rebuild Whether to re-read every row and rebuild every report, e.g. after older rows were edited
+    @param rebuild_interval The number of seconds after which a full rebuild is done, never if `None`
+    @return Set of addresses whose reports were regenerated
+    """
+    state, touched_addresses = sync_state(
+        responses_wks, load_state(state_path), grouped_directory, reports_directory, tract_summary_path,
+        forms_version, page_size, full_rebuild, rebuild_interval,
+    )
+    save_state(state, state_path)
+
+    return touched_addresses
+
+
+def sync_state(
+    responses_wks,
+    state,
+    grouped_directory=os.path.abspath("./grouped_responses/"),
+    reports_directory=os.path.abspath("./reports/reports_by_address/"),
+    tract_summary_path=tract_rollups.DEFAULT_SUMMARY_PATH,
+    forms_version=None,
+    page_size=paged_reader.DEFAULT_PAGE_SIZE,
+    full_rebuild=False,
+    rebuild_interval=DEFAULT_REBUILD_INTERVAL,
+):
+    """Regenerates the reports of the addresses touched since a state kept in memory
+
+    @param responses_wks The worksheet to load data from
+    @param state The state of the previous sync, or `None` to rebuild every report
+    @param grouped_directory Where the grouped responses are written
+    @param reports_directory Where the reports are written
+    @param tract_summary_path Where the census tract totals are written
+    @param forms_version The name of the forms version of the worksheet, defaults to the config's
+    @param page_size The number of rows fetched per request
+    @param full_rebuild Whether to re-read every row and rebuild every report, e.g. after older rows were edited
+    @param rebuild_interval The number of seconds after which a full rebuild is done, never if `None`
+    @return (updated state, set of addresses whose reports were regenerated)
+    """
+    if state is not None and not full_rebuild and rebuild_interval is not None:
+        full_rebuild = time.time() - state.get('rebuilt_at', 0) >= rebuild_interval
+    if state is not None and full_rebuild:
+        logger.info("Re-reading every response to pick up edits to older rows")
+        state = None
+
+    schema, new_rows, full_rebuild = fetch_new_rows(responses_wks, state, page_size)
+    plan = normalizers.compile_plan(schema, forms_version)
+
+    if full_rebuild:
+        state = {
+            'version': STATE_VERSION,
+            'schema': schema,
+            'row_count': 0,
+            'last_row': [],
+            'last_timestamp': None,
+            'rows_by_address': {},
+            'tract_rollup': {},
+            'rebuilt_at': time.time(),
+        }
+
+    # The previous state is left untouched until every report is written, so a failed sync is retried
+    # from it: only the mapping and the row lists of the touched addresses are copied
+    state = dict(state, rows_by_address=dict(state['rows_by_address']))
+    rollup = tract_rollups.TractRollup.from_state(state['tract_rollup'])
+
+    # Rows are kept by canonical address, so every spelling of an address is regenerated together
+    rows_by_address = state['rows_by_address']
+    touched_keys = set()
+    # Rows without a usable address are only formatted so they are logged and counted as dropped
+    unaddressed_rows = []
+    for row in new_rows:
+        address = plan.raw_address(row)
+        key = address_index.canonical_address(address) if address else None
+        if key:
+            if key not in touched_keys:
+                rows_by_address[key] = list(rows_by_address.get(key, []))
+                touched_keys.add(key)
+            rows_by_address[key].append(_trim_row(row))
+        else:
+            unaddressed_rows.append(row)
+
+    if new_rows:
+        last_row = _trim_row(new_rows[-1])
+        last_resp = dict(zip(schema, last_row))
+
+        state['row_count'] += len(new_rows)
+        state['last_row'] = last_row
+        state['last_timestamp'] = last_resp.get('Timestamp') or state['last_timestamp']
+
+    if unaddressed_rows:
+        report_generator.format_rows(plan, unaddressed_rows)
+
+    touched_addresses = set()
+    if touched_keys:
+        formatted_resps = report_generator.format_rows(plan, [
+            row
+            for key in sorted(touched_keys)
+            for row in rows_by_address[key]
+        ])
+        grouped_resps = report_generator.group_responses_by_address(formatted_resps)
+        touched_addresses.update(grouped_resps)
+        compressed_grouped_resps = report_generator.compress_grouped_responses(grouped_resps, rollup)
+
+        reports = report_generator.generate_reports(grouped_resps, compressed_grouped_resps)
+
+        # Only some addresses are rewritten, so the files of the others must not be pruned
+        report_generator.write_grouped_resps_to_disk(grouped_resps, grouped_directory, prune=full_rebuild)
+        report_generator.write_reports_to_disk(
+            reports, compressed_grouped_resps, reports_directory, prune=full_rebuild,
+        )
+
+        rollup.write_csv(tract_summary_path)
+
+    state['tract_rollup'] = rollup.to_state()
+
+    logger.info("Incremental sync processed %d new rows and regenerated %d addresses" % (
+        len(new_rows), len(touched_addresses),
+    ))
+
+    return state, touched_addresses
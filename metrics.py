@@ -0,0 +1,184 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is then not reported
+    resource = None
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+
+    # `ru_maxrss` is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Metrics:
+    """Per-stage wall time, peak memory and counters of a run
+
+    Recording is a few dictionary updates per stage or counter, cheap enough to leave on in production.
+    `process_peak_rss_bytes` is the high-water mark of the whole process when the stage ended, so it
+    includes earlier stages; `rss_growth_bytes` is how much the stage itself raised it. Peak traced
+    memory is only recorded while `tracemalloc` is tracing, e.g. under `--profile`.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._active_stages = []
+        # Traced peak of each active stage from before a nested stage reset the `tracemalloc` peak
+        self._traced_peaks = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Records the wall time and peak memory of the enclosed block
+
+        @param name The name of the stage, repeated stages are added up
+        """
+        stage_metrics = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'counters': {}})
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Resetting the peak would lose the peak of the enclosing stage so far, keep it aside
+            if self._traced_peaks:
+                self._traced_peaks[-1] = max(self._traced_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._traced_peaks.append(0)
+
+        start_peak_rss_bytes = _peak_rss_bytes()
+        self._active_stages.append(stage_metrics)
+        start = time.perf_counter()
+        try:
+            yield stage_metrics
+        finally:
+            stage_metrics['seconds'] += time.perf_counter() - start
+            stage_metrics['calls'] += 1
+            self._active_stages.pop()
+            traced_peak = self._traced_peaks.pop()
+
+            peak_rss_bytes = _peak_rss_bytes()
+            if peak_rss_bytes is not None:
+                stage_metrics['process_peak_rss_bytes'] = peak_rss_bytes
+                stage_metrics['rss_growth_bytes'] = max(
+                    stage_metrics.get('rss_growth_bytes', 0), peak_rss_bytes - start_peak_rss_bytes,
+                )
+            if tracing and tracemalloc.is_tracing():
+                traced_peak = max(traced_peak, tracemalloc.get_traced_memory()[1])
+                stage_metrics['peak_traced_bytes'] = max(stage_metrics.get('peak_traced_bytes', 0), traced_peak)
+
+                if self._traced_peaks:
+                    self._traced_peaks[-1] = max(self._traced_peaks[-1], traced_peak)
+
+    def count(self, name, value=1):
+        """Adds to a counter of the run and of the stage currently running
+
+        @param name The name of the counter
+        @param value The amount to add
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+        if self._active_stages:
+            stage_counters = self._active_stages[-1]['counters']
+            stage_counters[name] = stage_counters.get(name, 0) + value
+
+    def merge(self, summary):
+        """Adds up the summary of another run, e.g. of a worker process
+
+        @param summary A summary returned by `Metrics.summary`
+        """
+        for name, value in summary['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+        for name, other_stage in summary['stages'].items():
+            stage_metrics = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'counters': {}})
+            stage_metrics['seconds'] += other_stage['seconds']
+            stage_metrics['calls'] += other_stage['calls']
+
+            for counter_name, value in other_stage['counters'].items():
+                stage_metrics['counters'][counter_name] = stage_metrics['counters'].get(counter_name, 0) + value
+
+            for peak_name in ('process_peak_rss_bytes', 'rss_growth_bytes', 'peak_traced_bytes'):
+                if peak_name in other_stage:
+                    stage_metrics[peak_name] = max(stage_metrics.get(peak_name, 0), other_stage[peak_name])
+
+    def summary(self):
+        return {'stages': self.stages, 'counters': self.counters}
+
+    def write_json(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'w') as metrics_file:
+            metrics_file.write(json.dumps(self.summary(), indent=2, sort_keys=True))
+
+
+# Metrics of the current run, recorded into by the pipeline stages
+_current = Metrics()
+
+
+def current():
+    return _current
+
+
+def reset():
+    """Starts recording a new run
+
+    @return The new `Metrics`
+    """
+    global _current
+    _current = Metrics()
+
+    return _current
+
+
+def stage(name):
+    return _current.stage(name)
+
+
+def count(name, value=1):
+    _current.count(name, value)
+
+
+#############
+# PROFILING #
+#############
+
+@contextlib.contextmanager
+def profile(directory, num_entries=50):
+    """Runs the enclosed block under cProfile and tracemalloc and dumps their results
+
+    @param directory Where `run.prof`, `cprofile.txt` and `tracemalloc.txt` are written
+    @param num_entries The number of entries in the text reports
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        profiler.dump_stats(os.path.join(directory, "run.prof"))
+
+        stats_output = io.StringIO()
+        pstats.Stats(profiler, stream=stats_output).sort_stats('cumulative').print_stats(num_entries)
+        with open(os.path.join(directory, "cprofile.txt"), 'w') as stats_file:
+            stats_file.write(stats_output.getvalue())
+
+        with open(os.path.join(directory, "tracemalloc.txt"), 'w') as allocations_file:
+            allocations_file.write("\n".join(
+                str(stat) for stat in snapshot.statistics('lineno')[:num_entries]
+            ))
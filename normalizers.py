@@ -0,0 +1,181 @@
+import functools
+
+import records
+import service
+
+
+class FormsVersion:
+    """Everything that depends on the version of the forms a worksheet was filled in with"""
+
+    def __init__(
+        self,
+        name,
+        address_field,
+        renamed_fields=None,
+        converted_fields=None,
+        normalize_compressed_resp=None,
+        report_template=None,
+    ):
+        """
+        @param name The name of the version, as used in the config
+        @param address_field The field holding the address of a response
+        @param renamed_fields Dictionary mapping the old name of a field to its current name
+        @param converted_fields Dictionary mapping a field to a function converting a whole column of its values
+        @param normalize_compressed_resp Function normalizing the compressed response of an address
+        @param report_template The report template of the version
+        """
+        self.name = name
+        self.address_field = address_field
+        self.renamed_fields = renamed_fields or {}
+        self.converted_fields = converted_fields or {}
+        self.normalize_compressed_resp = normalize_compressed_resp or (lambda compressed_resp: compressed_resp)
+        self.report_template = report_template
+
+
+_registry = {}
+
+
+def register(forms_version):
+    """Registers a forms version so worksheets filled in with it can be normalized
+
+    @param forms_version The `FormsVersion` to register
+    @return The registered `FormsVersion`
+    """
+    _registry[forms_version.name] = forms_version
+    _compile_plan.cache_clear()
+
+    return forms_version
+
+
+def get(name=None):
+    """Looks up a registered forms version
+
+    @param name The name of the version, defaults to the `forms_version` of the config
+    @return The `FormsVersion`
+    """
+    name = name or service.get_forms_version()
+    try:
+        return _registry[name]
+    except KeyError:
+        raise ValueError("Unknown forms version {0!r}, registered versions are {1}".format(
+            name, sorted(_registry),
+        ))
+
+
+def version_of(resp):
+    """Looks up the forms version a response was normalized with
+
+    @param resp A response record, plain mappings use the `forms_version` of the config
+    @return The `FormsVersion`
+    """
+    return get(getattr(getattr(resp, 'schema', None), 'forms_version', None))
+
+
+class MigrationPlan:
+    """Normalization of the rows of a worksheet, compiled once from its header
+
+    Renames only depend on which columns the header holds, so an old column whose new name is not in
+    the header is renamed in the schema itself and costs nothing per row. Only headers holding both
+    the old and the new column check every row for conflicts. Typed conversions run a whole column at
+    a time.
+    """
+
+    def __init__(self, forms_version, header):
+        """
+        @param forms_version The `FormsVersion` the worksheet was filled in with
+        @param header The column names of the worksheet
+        """
+        self.forms_version = forms_version
+
+        header_fields = set(header)
+        migrated_header = [
+            forms_version.renamed_fields[col_name]
+            if col_name in forms_version.renamed_fields
+            and forms_version.renamed_fields[col_name] not in header_fields
+            else col_name
+            for col_name in header
+        ]
+
+        self.schema = records.ResponseSchema(migrated_header, forms_version=forms_version.name)
+
+        # (old field, new field) pairs whose columns are both in the header
+        self.conflicting_renames = [
+            (old_field, new_field, self.schema.index[old_field], self.schema.index[new_field])
+            for old_field, new_field in sorted(forms_version.renamed_fields.items())
+            if old_field in header_fields and new_field in header_fields
+        ]
+
+        self.conversions = [
+            (field, convert, self.schema.index.get(field))
+            for field, convert in sorted(forms_version.converted_fields.items())
+        ]
+
+        self.address_idx = self.schema.add_field(forms_version.address_field)
+        self.address_columns = [
+            col_idx
+            for col_idx, col_name in enumerate(migrated_header)
+            if col_name == forms_version.address_field
+        ]
+
+    def records_from_rows(self, rows):
+        """Creates normalized records from raw worksheet rows
+
+        @param rows The raw rows, excluding the header row
+        @return List of `records.ResponseRecord`
+        """
+        resps = [self.schema.record_from_row(row) for row in rows]
+        if not resps:
+            return resps
+
+        for old_field, new_field, old_idx, new_idx in self.conflicting_renames:
+            for resp in resps:
+                values = resp.values
+                if values[old_idx] is None:
+                    continue
+                if values[new_idx] is not None:
+                    raise Exception("The old field and new field cannot both be present: ({old} -> {new})".format(
+                        old=old_field, new=new_field,
+                    ))
+
+                values[new_idx] = values[old_idx]
+                values[old_idx] = None
+
+        for field, convert, idx in self.conversions:
+            column = [resp.values[idx] for resp in resps] if idx is not None else [None]
+            if None in column:
+                raise KeyError(field)
+
+            for resp, value in zip(resps, convert(column)):
+                resp.values[idx] = value
+
+        return resps
+
+    def address(self, resp):
+        """Extracts the address of a record created by this plan, `None` if it has none"""
+        values = resp.values
+        return values[self.address_idx] if self.address_idx < len(values) else None
+
+    def raw_address(self, row):
+        """Extracts the address of a raw worksheet row without normalizing it, `None` if it has none"""
+        address = None
+        for col_idx in self.address_columns:
+            if col_idx < len(row) and row[col_idx] != '':
+                address = row[col_idx]
+
+        return address
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_plan(forms_version_name, header):
+    return MigrationPlan(get(forms_version_name), header)
+
+
+def compile_plan(header, forms_version=None):
+    """Compiles the migration plan of a worksheet, reusing the plans of headers already compiled
+
+    @param header The column names of the worksheet
+    @param forms_version The name of the forms version, defaults to the `forms_version` of the config
+    @return A `MigrationPlan`
+    """
+    return _compile_plan(get(forms_version).name, tuple(header))
+
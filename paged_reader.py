@@ -0,0 +1,239 @@
+import concurrent.futures
+import logging
+import random
+import time
+
+import metrics
+
+logger = logging.getLogger("das-care-contact-forms-logger")
+
+DEFAULT_PAGE_SIZE = 5000
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 32.0
+
+# Rate limited requests and transient server errors are worth retrying, client errors are not
+RETRYABLE_STATUS_CODES = frozenset([408, 429, 500, 502, 503, 504])
+
+
+################
+# HELPER FUNCS #
+################
+
+def get_row_range(wks, first_row, last_row=None):
+    """Fetches a contiguous range of raw rows from a worksheet
+
+    @param wks The worksheet to load data from
+    @param first_row The 1-indexed row to start from
+    @param last_row The 1-indexed row to stop at (inclusive), defaults to the last row of the worksheet
+    @return List of rows, each a list of cell values
+    """
+    if not hasattr(wks, 'get_values'):
+        return wks.get_all_values()[first_row - 1:last_row]
+
+    if last_row is None:
+        last_row = wks.row_count
+    if last_row < first_row:
+        return []
+
+    return wks.get_values("{0}:{1}".format(first_row, last_row))
+
+
+def grid_row_count(wks):
+    """Looks up the number of rows of a worksheet's grid as it is now
+
+    gspread caches `row_count` from when the worksheet was opened, so the metadata of its spreadsheet
+    is fetched again. Other worksheets are trusted to keep `row_count` up to date.
+
+    @param wks The worksheet
+    @return The number of rows, or `None` if the worksheet does not know it
+    """
+    spreadsheet = getattr(wks, 'spreadsheet', None)
+    if spreadsheet is not None and hasattr(spreadsheet, 'fetch_sheet_metadata'):
+        for sheet in spreadsheet.fetch_sheet_metadata()['sheets']:
+            if sheet['properties']['sheetId'] == wks.id:
+                return sheet['properties']['gridProperties']['rowCount']
+
+    return getattr(wks, 'row_count', None)
+
+
+def is_retryable(error):
+    """Checks whether a failed request is worth retrying
+
+    @param error The exception raised by the request
+    @return True for rate limiting, transient server errors, timeouts and dropped connections
+    """
+    # gspread's `APIError` keeps the HTTP response it was raised for
+    status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+
+    # Socket timeouts and connection errors, including the ones raised by `requests`, are `OSError`s
+    return isinstance(error, OSError)
+
+
+def backoff_delay(attempt, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+    """Picks how long to wait before a retry, using exponential backoff with full jitter
+
+    The jitter spreads out the retries of concurrent readers hitting the same rate limit.
+
+    @param attempt The number of failed attempts so far, starting at 1
+    @param base_delay The delay cap of the first retry, in seconds
+    @param max_delay The largest delay cap, in seconds
+    @return The delay in seconds
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def call_with_retry(
+    func,
+    max_retries=DEFAULT_MAX_RETRIES,
+    base_delay=DEFAULT_BASE_DELAY,
+    max_delay=DEFAULT_MAX_DELAY,
+    sleep=time.sleep,
+):
+    """Calls a function, retrying it with backoff while it fails with a retryable error
+
+    @param func The function to call, without arguments
+    @param max_retries The number of retries before the error is raised
+    @param base_delay The delay cap of the first retry, in seconds
+    @param max_delay The largest delay cap, in seconds
+    @param sleep Function waiting a number of seconds
+    @return The return value of `func`
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as error:
+            attempt += 1
+            if attempt > max_retries or not is_retryable(error):
+                raise
+
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logger.warning("Request failed (%s), retry %d of %d in %.1fs" % (error, attempt, max_retries, delay))
+            metrics.count('fetch_retries')
+            sleep(delay)
+
+
+#################
+# PAGED READING #
+#################
+
+class PagedReader:
+    """Reads the rows of a worksheet in fixed-size row ranges
+
+    The next page is fetched in the background while the caller processes the current one. Failed
+    requests are retried with backoff, and if a page still fails `next_row` is left at its first row,
+    so iterating again resumes from the last good page instead of starting over.
+
+    The Sheets API drops the trailing empty rows of a range, so an empty or short page either ends the
+    sheet or ends with cleared rows. The current size of the grid tells them apart, the cached
+    `row_count` is not trusted as rows are appended after the worksheet was opened. Cleared rows are
+    yielded as empty rows, once a later page shows that rows follow them.
+    """
+
+    def __init__(
+        self,
+        wks,
+        page_size=DEFAULT_PAGE_SIZE,
+        first_row=2,
+        max_retries=DEFAULT_MAX_RETRIES,
+        base_delay=DEFAULT_BASE_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        sleep=time.sleep,
+    ):
+        """
+        @param wks The worksheet to load data from
+        @param page_size The number of rows fetched per request
+        @param first_row The 1-indexed row to start from, defaults to the first row after the header
+        @param max_retries The number of retries of each page before its error is raised
+        @param base_delay The delay cap of the first retry, in seconds
+        @param max_delay The largest delay cap, in seconds
+        @param sleep Function waiting a number of seconds
+        """
+        self.wks = wks
+        self.page_size = page_size
+        self.next_row = first_row
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+        # Only a hint, see `_is_past_grid`
+        self.known_row_count = getattr(wks, 'row_count', None)
+        self.grid_row_count = None
+
+    def _fetch_page(self, first_row):
+        return call_with_retry(
+            lambda: get_row_range(self.wks, first_row, first_row + self.page_size - 1),
+            self.max_retries, self.base_delay, self.max_delay, self.sleep,
+        )
+
+    def _is_past_grid(self, first_row, error):
+        """Checks whether a page failed because it starts past the last row of the grid
+
+        The Sheets API rejects such ranges as a client error. Past the row count known when the
+        worksheet was opened, that means the previous page was the last and happened to be full.
+        """
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+
+        return status_code == 400 and self.known_row_count is not None and first_row > self.known_row_count
+
+    def _is_last_page(self, first_row):
+        """Checks whether the range of a short page reaches the end of the grid, refreshing its size"""
+        if self.grid_row_count is None or first_row + self.page_size - 1 >= self.grid_row_count:
+            self.grid_row_count = call_with_retry(
+                lambda: grid_row_count(self.wks), self.max_retries, self.base_delay, self.max_delay, self.sleep,
+            )
+
+        return self.grid_row_count is None or first_row + self.page_size - 1 >= self.grid_row_count
+
+    def pages(self):
+        """Fetches the pages of the worksheet, up to the end of its grid
+
+        @return Generator of pages, each a list of raw rows
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            first_row = self.next_row
+            # Rows cleared at the end of the pages read so far, only yielded if rows follow them
+            num_cleared_rows = 0
+
+            future = executor.submit(self._fetch_page, first_row)
+            while future is not None:
+                try:
+                    page = future.result()
+                except Exception as error:
+                    if not self._is_past_grid(first_row, error):
+                        raise
+                    return
+
+                if len(page) < self.page_size and self._is_last_page(first_row):
+                    future = None
+                else:
+                    future = executor.submit(self._fetch_page, first_row + self.page_size)
+
+                if page:
+                    metrics.count('pages_fetched')
+                    self.next_row = first_row + len(page)
+                    yield [[] for _ in range(num_cleared_rows)] + page
+                    num_cleared_rows = 0
+
+                num_cleared_rows += self.page_size - len(page)
+                first_row += self.page_size
+
+    def rows(self):
+        """Fetches the rows of the worksheet
+
+        @return Generator of raw rows
+        """
+        for page in self.pages():
+            for row in page:
+                yield row
+
+    def read(self):
+        """Fetches all the remaining rows of the worksheet
+
+        @return List of raw rows
+        """
+        return list(self.rows())
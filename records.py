@@ -0,0 +1,126 @@
+import collections.abc
+import sys
+
+
+class ResponseSchema:
+    """Column layout shared by every response record read from the same worksheet
+
+    Column indices are resolved once from the header row. Duplicate column names share an index.
+    """
+
+    __slots__ = ('fields', 'index', 'column_indices', 'forms_version')
+
+    def __init__(self, header, forms_version=None):
+        """
+        @param header The column names of the worksheet
+        @param forms_version The name of the forms version the worksheet was filled in with, if known
+        """
+        self.forms_version = forms_version
+        self.fields = []
+        self.index = {}
+        self.column_indices = [self.add_field(col_name) for col_name in header]
+
+    def add_field(self, name):
+        """Resolves the index of a field, appending it to the schema if it is new
+
+        @param name The name of the field
+        @return The index of the field in the record values
+        """
+        idx = self.index.get(name)
+        if idx is None:
+            idx = self.index[sys.intern(name)] = len(self.fields)
+            self.fields.append(name)
+
+        return idx
+
+    def record_from_row(self, row):
+        """Creates a record from a raw worksheet row, empty cells are left unset
+
+        @param row The raw cell values, in header order
+        @return A `ResponseRecord`
+        """
+        values = [None] * len(self.fields)
+        for idx, cell_val in zip(self.column_indices, row):
+            if cell_val != '':
+                values[idx] = cell_val
+
+        return ResponseRecord(self, values)
+
+
+class ResponseRecord(collections.abc.MutableMapping):
+    """Mapping view over a list of values laid out by a shared `ResponseSchema`
+
+    Unset fields are stored as `None` and are not part of the mapping.
+    """
+
+    __slots__ = ('schema', 'values')
+
+    def __init__(self, schema, values):
+        self.schema = schema
+        self.values = values
+
+    def __getitem__(self, key):
+        idx = self.schema.index.get(key)
+        if idx is None or idx >= len(self.values) or self.values[idx] is None:
+            raise KeyError(key)
+
+        return self.values[idx]
+
+    def get(self, key, default=None):
+        idx = self.schema.index.get(key)
+        if idx is None or idx >= len(self.values) or self.values[idx] is None:
+            return default
+
+        return self.values[idx]
+
+    def __setitem__(self, key, value):
+        idx = self.schema.add_field(key)
+
+        # Fields added to the schema after this record was created are padded lazily
+        if idx >= len(self.values):
+            self.values.extend([None] * (idx + 1 - len(self.values)))
+
+        self.values[idx] = value
+
+    def __delitem__(self, key):
+        # Raises `KeyError` if the field is unset
+        self[key]
+        self.values[self.schema.index[key]] = None
+
+    def __iter__(self):
+        fields = self.schema.fields
+        return (fields[idx] for idx, val in enumerate(self.values) if val is not None)
+
+    def __len__(self):
+        return sum(1 for val in self.values if val is not None)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def copy(self):
+        return ResponseRecord(self.schema, list(self.values))
+
+
+def compress_records(records):
+    """Merges records so the last non-empty value of each field wins
+
+    @param records The non-empty list of records to merge, oldest first
+    @return A `ResponseRecord` holding the merged values
+    """
+    schema = getattr(records[0], 'schema', None)
+
+    # Plain mappings and mixed schemas fall back to merging field by field
+    if schema is None or any(getattr(record, 'schema', None) is not schema for record in records):
+        compressed = ResponseRecord(schema or ResponseSchema([]), [])
+        for record in records:
+            compressed.update(record)
+
+        return compressed
+
+    values = [None] * len(schema.fields)
+    for record in records:
+        for idx, val in enumerate(record.values):
+            if val is not None:
+                values[idx] = val
+
+    return ResponseRecord(schema, values)
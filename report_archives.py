@@ -0,0 +1,239 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+
+import address_index
+import disk_writer
+
+DEFAULT_ARCHIVE_DIR = os.path.abspath("./reports/report_archives/")
+
+# An archive is the magic, the UTF-8 reports back to back, a JSON index and a fixed-size trailer
+# holding the offset and length of the index followed by the magic again
+ARCHIVE_MAGIC = b"CAREPACK1\n"
+ARCHIVE_EXTENSION = ".pack"
+TRAILER_FORMAT = '<QQ'
+TRAILER_SIZE = struct.calcsize(TRAILER_FORMAT) + len(ARCHIVE_MAGIC)
+
+
+################
+# HELPER FUNCS #
+################
+
+def archive_name(census_tract):
+    """Formats the file name of the archive of a census tract, e.g. `ct_445.pack`"""
+    return "ct_{0}{1}".format((census_tract or '').replace('.', ''), ARCHIVE_EXTENSION)
+
+
+def pack_reports(reports):
+    """Packs reports into a single archive
+
+    @param reports Dictionary mapping address to report
+    @return The archive bytes
+    """
+    chunks = [ARCHIVE_MAGIC]
+    offset = len(ARCHIVE_MAGIC)
+    index = {}
+    for address in sorted(reports):
+        encoded_report = reports[address].encode('utf-8')
+        index[address_index.address_slug(address)] = [offset, len(encoded_report), address]
+
+        chunks.append(encoded_report)
+        offset += len(encoded_report)
+
+    encoded_index = json.dumps({'reports': index}, sort_keys=True).encode('utf-8')
+    chunks.append(encoded_index)
+    chunks.append(struct.pack(TRAILER_FORMAT, offset, len(encoded_index)) + ARCHIVE_MAGIC)
+
+    return b"".join(chunks)
+
+
+class ReportArchive:
+    """Read access to the reports of a packed archive
+
+    The archive is memory-mapped, so looking up a report only reads the index and that report.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as archive_file:
+            self._mmap = mmap.mmap(archive_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            trailer = self._mmap[-TRAILER_SIZE:]
+            if len(self._mmap) < len(ARCHIVE_MAGIC) + TRAILER_SIZE or not (
+                self._mmap[:len(ARCHIVE_MAGIC)] == ARCHIVE_MAGIC and trailer.endswith(ARCHIVE_MAGIC)
+            ):
+                raise ValueError("{0} is not a report archive".format(path))
+
+            index_offset, index_length = struct.unpack(TRAILER_FORMAT, trailer[:-len(ARCHIVE_MAGIC)])
+            self.index = json.loads(self._mmap[index_offset:index_offset + index_length].decode('utf-8'))['reports']
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    def addresses(self):
+        """Lists the addresses in the archive, as displayed in their reports"""
+        return sorted(address for _, _, address in self.index.values())
+
+    def __contains__(self, address):
+        return address_index.address_slug(address) in self.index
+
+    def get(self, address):
+        """Reads the report of an address
+
+        @param address Any spelling of the address
+        @return The report, or `None` if the address is not in the archive
+        """
+        entry = self.index.get(address_index.address_slug(address))
+        if entry is None:
+            return None
+
+        offset, length, _ = entry
+        return self._mmap[offset:offset + length].decode('utf-8')
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def archive_paths(directory):
+    """Lists the archives of a directory, sorted by name"""
+    if not os.path.isdir(directory):
+        return []
+
+    return [
+        os.path.join(directory, file_name)
+        for file_name in sorted(os.listdir(directory))
+        if file_name.endswith(ARCHIVE_EXTENSION)
+    ]
+
+
+def find_report(directory, address, census_tract=None):
+    """Looks up the report of an address in a directory of archives
+
+    @param directory The directory holding the archives
+    @param address Any spelling of the address
+    @param census_tract The census tract of the address, all archives are searched if not given
+    @return The report, or `None` if no archive holds the address
+    """
+    if census_tract is not None:
+        paths = [os.path.join(directory, archive_name(census_tract))]
+        paths = [path for path in paths if os.path.exists(path)]
+    else:
+        paths = archive_paths(directory)
+
+    for path in paths:
+        with ReportArchive(path) as archive:
+            report = archive.get(address)
+            if report is not None:
+                return report
+
+    return None
+
+
+############################
+# WRITING ARCHIVES TO DISK #
+############################
+
+def write_report_archives(
+    reports,
+    compressed_grouped_responses,
+    directory=DEFAULT_ARCHIVE_DIR,
+    max_workers=disk_writer.DEFAULT_MAX_WORKERS,
+    manifest=None,
+    prune=True,
+):
+    """Writes the reports of each census tract to a single packed archive
+
+    Archives whose content did not change are not rewritten, and archives of census tracts without
+    reports anymore are removed.
+
+    @param reports Dictionary mapping address to report
+    @param compressed_grouped_responses Compressed responses of each address
+    @param directory The output directory
+    @param max_workers The number of archives written concurrently
+    @param manifest A `disk_writer.Manifest` shared across calls, loaded and saved here if `None`
+    @param prune Whether to remove the archives of census tracts not in `reports`
+    @return A `disk_writer.WriteSummary`
+    """
+    reports_by_tract = {}
+    for address, report in reports.items():
+        census_tract = compressed_grouped_responses[address].get('Census Tract')
+        reports_by_tract.setdefault(archive_name(census_tract), {})[address] = report
+
+    owns_manifest = manifest is None
+    if owns_manifest:
+        manifest = disk_writer.Manifest(directory)
+
+    summary = manifest.write(
+        dict(
+            (name, (name, pack_reports(tract_reports)))
+            for name, tract_reports in reports_by_tract.items()
+        ),
+        max_workers=max_workers,
+    )
+    if prune:
+        summary = summary._replace(removed=summary.removed + manifest.prune(reports_by_tract.keys()))
+
+    if owns_manifest:
+        manifest.save()
+
+    return summary
+
+
+########
+# MAIN #
+########
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read reports from packed census tract archives")
+    parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR, help="directory holding the archives")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    print_parser = subparsers.add_parser('print', help="print the report of an address")
+    print_parser.add_argument('address', help="the address, in any spelling")
+    print_parser.add_argument('--tract', help="census tract of the address, all archives are searched otherwise")
+
+    extract_parser = subparsers.add_parser('extract', help="extract the report of an address to a file")
+    extract_parser.add_argument('address', help="the address, in any spelling")
+    extract_parser.add_argument('--tract', help="census tract of the address, all archives are searched otherwise")
+    extract_parser.add_argument('--output', help="path of the extracted report, defaults to <address>.txt")
+
+    list_parser = subparsers.add_parser('list', help="list the addresses of the archives")
+    list_parser.add_argument('--tract', help="only list the addresses of this census tract")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        paths = archive_paths(args.archive_dir)
+        if args.tract:
+            paths = [path for path in paths if os.path.basename(path) == archive_name(args.tract)]
+        for path in paths:
+            with ReportArchive(path) as archive:
+                for address in archive.addresses():
+                    print(address)
+        return
+
+    report = find_report(args.archive_dir, args.address, args.tract)
+    if report is None:
+        sys.exit("No report found for address {0!r}".format(args.address))
+
+    if args.command == 'print':
+        print(report)
+    else:
+        output_path = args.output or "{0}.txt".format(address_index.address_slug(args.address))
+        disk_writer.write_file_atomically(output_path, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
+import argparse
 import datetime
 import functools
-import itertools
 import logging
 import os
 import re
 
+import address_index
+import concurrent_fetch
+import contact_history
+import disk_writer
+import metrics
+import normalizers
+import paged_reader
+import records
+import response_store
+import report_template
 import service
+import snapshot_cache
+import summary_sheet
+import tract_rollups
 
 logger = logging.getLogger("das-care-contact-forms-logger")
-logger.info("Generating Reports for {0}".format(service.main_spreadsheet_name))
 
 REPORT_TEMPLATE = [
     [
@@ -50,15 +62,35 @@ REPORT_TEMPLATE = [
 # HELPER FUNCS #
 ################
 
+TIMESTAMP_REGEX = re.compile(
+    r"(?P<month>\d+)/(?P<day>\d+)/(?P<year>\d+)(\s(?P<hour>\d+)\:(?P<minute>\d+)\:(?P<second>\d+))?"
+)
+
+
+@functools.lru_cache(maxsize=8192)
 def convert_timestamp(timestamp_string):
     """Utility function that converts a timestamp string to a datetime string
 
+    Conversions are memoized as many responses share the same contact date.
+
     @timestamp_string The string to create a `datetime` object from
     @return a `datetime` object
     """
-    timestamp_regex = r"(?P<month>\d+)/(?P<day>\d+)/(?P<year>\d+)(\s(?P<hour>\d+)\:(?P<minute>\d+)\:(?P<second>\d+))?"
-
-    match = re.search(timestamp_regex, timestamp_string)
+    # Fast path for the `M/D/YYYY[ HH:MM:SS]` format used by the forms
+    date_part, _, time_part = timestamp_string.strip().partition(' ')
+    try:
+        month, day, year = date_part.split('/')
+        if not time_part:
+            return datetime.datetime(int(year), int(month), int(day))
+
+        hour, minute, second = time_part.split(':')
+        return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    except ValueError:
+        pass
+
+    match = TIMESTAMP_REGEX.search(timestamp_string)
+    if match is None:
+        raise ValueError("Malformed timestamp {0!r}, expected M/D/YYYY[ HH:MM:SS]".format(timestamp_string))
 
     return datetime.datetime(**dict(
         (key, int(val))
@@ -66,29 +98,20 @@ def convert_timestamp(timestamp_string):
     ))
 
 
-def normalize_resp_V1(resp):
-    resp['Timestamp'] = convert_timestamp(resp['Timestamp'])
-    resp['Date of Contact'] = convert_timestamp(resp['Date of Contact'])
+def convert_timestamps(timestamp_strings):
+    """Converts a whole column of timestamp strings to `datetime` objects
 
-    updated_fields = {
-        'Negative Compliance?': 'Negative?',
-        'Registered Animals': 'Registered?',
-        'Spayed/Neutered Animals': 'Spayed/Neutered?',
-        'Vaccinated Animals': 'Vaccinated?',
-    }
-
-    # Migrate the updated fields over to the new version
-    for old_field, new_field in updated_fields.items():
-        if resp.get(old_field):
-            if resp.get(new_field):
-                raise Exception("The old field and new field cannot both be present: ({old} -> {new})".format(
-                    old=old_field, new=new_field,
-                ))
+    @param timestamp_strings Iterable of timestamp strings
+    @return List of `datetime` objects in the same order
+    """
+    timestamp_strings = list(timestamp_strings)
 
-            resp[new_field] = resp[old_field]
-            del resp[old_field]
+    converted = {}
+    for timestamp_string in timestamp_strings:
+        if timestamp_string not in converted:
+            converted[timestamp_string] = convert_timestamp(timestamp_string)
 
-    return resp
+    return [converted[timestamp_string] for timestamp_string in timestamp_strings]
 
 
 def normalize_compressed_resp_V1(compressed_resp):
@@ -107,113 +130,188 @@ def normalize_compressed_resp_V1(compressed_resp):
     return compressed_resp
 
 
-# Normalize individual responses
-normalize_resp = {
-    'V1': normalize_resp_V1
-}[service.forms_version]
+normalizers.register(normalizers.FormsVersion(
+    'V1',
+    address_field='Street Address',
+    renamed_fields={
+        'Negative Compliance?': 'Negative?',
+        'Registered Animals': 'Registered?',
+        'Spayed/Neutered Animals': 'Spayed/Neutered?',
+        'Vaccinated Animals': 'Vaccinated?',
+    },
+    converted_fields={
+        'Timestamp': convert_timestamps,
+        'Date of Contact': convert_timestamps,
+    },
+    normalize_compressed_resp=normalize_compressed_resp_V1,
+    report_template=REPORT_TEMPLATE,
+))
+
+
+# The forms version of a response is the one of the worksheet it was read from, falling back to the
+# config, so importing this module does not load the config
+def normalize_compressed_resp(compressed_resp):
+    return normalizers.version_of(compressed_resp).normalize_compressed_resp(compressed_resp)
+
 
-# Normalize compressed responses
-normalize_compressed_resp = {
-    'V1': normalize_compressed_resp_V1
-}[service.forms_version]
+def address_extractor(resp):
+    return resp.get(normalizers.version_of(resp).address_field)
 
-address_extractor = {
-    'V1': lambda resp: resp.get('Street Address')
-}[service.forms_version]
 
 ##########################
 # REPORT GENERATOR FUNCS #
 ##########################
 
-def format_responses(responses_wks):
-    """Format the data in the worksheet into list of dicts
+def format_responses(responses_wks, page_size=paged_reader.DEFAULT_PAGE_SIZE, forms_version=None):
+    """Format the data in the worksheet into list of response records
+
+    The rows are read page by page, the next page being fetched while the current one is formatted.
 
     @param responses_wks The worksheet to load data from
+    @param page_size The number of rows fetched per request
+    @param forms_version The name of the forms version of the worksheet, defaults to the config's
     @return List of row mappings from column name to cell value
     """
-    # The column names are in the first row
-    schema = responses_wks.row_values(1)
-    row_values = responses_wks.get_all_values()[1:]
-
-    # Map responses to the schema and normalize each response
-    mapped_response_data = [
-        normalize_resp(dict(
-            (col_name, cell_val)
-            for col_name, cell_val in zip(schema, response)
-            if cell_val != ''
-        ))
-        for response in row_values
-    ]
+    # The column names are in the first row, compile them once so every page shares the plan
+    plan = normalizers.compile_plan(responses_wks.row_values(1), forms_version)
 
-    # Validate that the address field is not empty
-    for response in (r for r in mapped_response_data if not address_extractor(r)):
-        logger.warning("The following response has been ignored because it has no address: %s" % response)
-        mapped_response_data.remove(response)
+    mapped_response_data = []
+    for page in paged_reader.PagedReader(responses_wks, page_size).pages():
+        mapped_response_data.extend(format_rows(plan, page))
 
     return mapped_response_data
 
-def group_responses_by_address(formatted_resps):
-    """Groups formatted responses by the address field
 
-    @param formatted_resps The formatted responses to groupby
-    @return Dictionary mapping address to all entries from that address
+def format_rows(schema, row_values, forms_version=None):
+    """Format raw worksheet rows into a list of response records
+
+    @param schema The column names of the worksheet, or an already compiled `normalizers.MigrationPlan`
+    @param row_values The raw rows to format, excluding the header row
+    @param forms_version The name of the forms version of the worksheet, defaults to the config's
+    @return List of row mappings from column name to cell value
     """
-    return dict(
-        (address, list(resps))
-        for address, resps in itertools.groupby(
-            # Sort the responses by address and then timestamp
-            sorted(
-                formatted_resps,
-                # Extracts a tuple that will be compared from left to right
-                key=lambda resp: (address_extractor(resp), resp['Date of Contact'], resp['Timestamp'])
-            ),
-            key=address_extractor
-        )
-    )
+    # Renames, conflict checks and conversions are resolved once for all the rows
+    if isinstance(schema, normalizers.MigrationPlan):
+        plan = schema
+    else:
+        plan = normalizers.compile_plan(schema, forms_version)
+
+    resps = plan.records_from_rows(row_values)
 
+    # Validate that the address field is not empty, nor only punctuation that normalizes to nothing
+    mapped_response_data = []
+    for resp in resps:
+        address = plan.address(resp)
+        if not address or not address_index.canonical_address(address):
+            logger.warning("The following response has been ignored because it has no address: %s" % resp)
+            continue
 
-def compress_grouped_responses(grouped_resps):
+        mapped_response_data.append(resp)
+
+    metrics.count('rows', len(resps))
+    metrics.count('dropped_rows', len(resps) - len(mapped_response_data))
+
+    return mapped_response_data
+
+
+def group_responses_by_address(formatted_resps, history=None):
+    """Groups formatted responses by the canonical form of the address field
+
+    @param formatted_resps The formatted responses to groupby
+    @param history Optional `contact_history.ContactHistory` filled with the grouped responses
+    @return Dictionary mapping address, as spelled in its earliest response, to all entries from that address
+    """
+    # Bucket the responses by canonical address in a single pass, so every spelling of an address is
+    # grouped together
+    # The address field only depends on the forms version, so it is looked up once per schema
+    address_fields = {}
+    canonical_address = address_index.canonical_address
+    buckets = {}
+    for resp in formatted_resps:
+        schema = getattr(resp, 'schema', None)
+        address_field = address_fields.get(schema)
+        if address_field is None:
+            address_field = address_fields[schema] = normalizers.version_of(resp).address_field
+
+        address = resp.get(address_field)
+        if address:
+            buckets.setdefault(canonical_address(address), []).append(resp)
+
+    # Sort each address's responses by date of contact and then timestamp, which is nearly linear
+    # as the sheet is already in submission order
+    for resps in buckets.values():
+        resps.sort(key=lambda resp: (resp['Date of Contact'], resp['Timestamp']))
+
+    # Each address is displayed as spelled in its earliest response
+    grouped_resps = dict((address_extractor(resps[0]), resps) for resps in buckets.values())
+
+    if history is not None:
+        for address, resps in grouped_resps.items():
+            for resp in resps:
+                history.add(address, resp)
+
+    metrics.count('addresses', len(grouped_resps))
+
+    # Keep the addresses in sorted order
+    return dict((address, grouped_resps[address]) for address in sorted(grouped_resps))
+
+
+def compress_grouped_responses(grouped_resps, rollup=None):
     """Compress grouped responses to dislpay the most recent information
 
     @param grouped_resps Responses grouped by address and sorted by timestamp to be compressed
+    @param rollup Optional `tract_rollups.TractRollup` updated in the same pass
     @return A dictionary mapping addresses to compressed responses
     """
     compressed_responses = {}
     for address, responses in grouped_resps.items():
-        compressed = {}
-        for resp in responses:
-            compressed.update(resp)
+        # The last non-empty value of each column wins
+        compressed = records.compress_records(responses)
 
         compressed_responses[address] = normalize_compressed_resp(compressed)
 
+        if rollup is not None:
+            rollup.update(address, compressed_responses[address])
+
     return compressed_responses
 
 
-def generate_reports(grouped_resps, compressed_grouped_resps):
+def generate_reports(grouped_resps, compressed_grouped_resps, template=None, history=None):
+    """Renders a report for each address
+
+    @param grouped_resps Responses grouped by address and sorted by timestamp
+    @param compressed_grouped_resps Compressed responses of each address
+    @param template Report template to render, defaults to the template of the forms version
+    @param history The `contact_history.ContactHistory` of the responses, built if not given
+    @return A dictionary mapping addresses to reports
+    """
     address_to_report = {}
 
+    # Compiled templates are cached, so alternate templates are only compiled once
+    if template is not None:
+        template = report_template.compile_template(template)
+    templates_by_version = {}
+    # Records sharing a schema share a forms version, so its template is only looked up once
+    templates_by_schema = {}
+
+    if history is None:
+        history = contact_history.ContactHistory.from_grouped_responses(grouped_resps)
+
     format_date = lambda date: date.strftime("%m/%d/%y")
 
     for address in grouped_resps.keys():
+        initial_contact_dates = history.dates(address, 'Initial Contact')
+        care_letter_dates = history.dates(address, 'C.A.R.E. Letter')
+        phone_call_dates = [format_date(date) for date in history.dates(address, 'Phone Call')]
+        mail_dates = [format_date(date) for date in history.dates(address, 'Mail/Email')]
+
         report_data = {
             key: value for key, value in dict(
                 address=address,
-                initial_contact_date=(lambda resps: None if len(resps) == 0 else resps[0])([
-                    format_date(resp['Date of Contact']) for resp in grouped_resps[address]
-                    if resp['Type of Contact'] == 'Initial Contact'
-                ]),
-                care_letter_date=(lambda resps: None if len(resps) == 0 else resps[0])([
-                    format_date(resp['Date of Contact']) for resp in grouped_resps[address]
-                    if resp['Type of Contact'] == 'C.A.R.E. Letter'
-                ]),
-                list_of_phone_call_dates=(lambda dates: "[%s]" % ", ".join(dates) if dates else None)([
-                    format_date(resp['Date of Contact']) for resp in grouped_resps[address]
-                    if resp['Type of Contact'] == 'Phone Call'
-                ]),
-                list_of_mail_dates=(lambda dates: "[%s]" % ", ".join(dates) if dates else None)([
-                    format_date(resp['Date of Contact']) for resp in grouped_resps[address]
-                    if resp['Type of Contact'] == 'Mail/Email'
-                ]),
+                initial_contact_date=format_date(initial_contact_dates[0]) if initial_contact_dates else None,
+                care_letter_date=format_date(care_letter_dates[0]) if care_letter_dates else None,
+                list_of_phone_call_dates="[%s]" % ", ".join(phone_call_dates) if phone_call_dates else None,
+                list_of_mail_dates="[%s]" % ", ".join(mail_dates) if mail_dates else None,
                 census_tract=compressed_grouped_resps[address]['Census Tract'],
                 num_dogs=compressed_grouped_resps[address].get('How many dogs do they have?'),
                 num_cats=compressed_grouped_resps[address].get('How many cats do they have?'),
@@ -228,22 +326,20 @@ def generate_reports(grouped_resps, compressed_grouped_resps):
             ).items() if value
         }
 
-        # Function helpter to attempt substitution of report data into a report element
-        def attempt_substitution(report_element):
-            try:
-                return report_element.format(**report_data)
-            except KeyError:
-                return None
-
-        # Attempt to fill in each section, removing those where no successful substituion was made
-        report = '\n\n'.join(filter(None, map(
-            # Attempt to fill in each section of the report, removing unsuccessful substitutions
-            lambda report_section: '\n'.join(filter(
-                None,
-                map(attempt_substitution, report_section),
-            )),
-            REPORT_TEMPLATE,
-        )))
+        # Without an explicit template, each address uses the template of its forms version
+        address_template = template
+        if address_template is None:
+            schema = getattr(compressed_grouped_resps[address], 'schema', None)
+            address_template = templates_by_schema.get(schema)
+            if address_template is None:
+                forms_version = normalizers.version_of(compressed_grouped_resps[address])
+                if forms_version.name not in templates_by_version:
+                    templates_by_version[forms_version.name] = report_template.compile_template(
+                        forms_version.report_template
+                    )
+                address_template = templates_by_schema[schema] = templates_by_version[forms_version.name]
+
+        report = address_template.render(report_data)
 
         address_to_report[address] = report
 
@@ -254,54 +350,398 @@ def generate_reports(grouped_resps, compressed_grouped_resps):
 # WRITING DATA TO DISK FUNCS #
 ##############################
 
-def write_grouped_resps_to_disk(grouped_responses, directory=os.path.abspath("./grouped_responses/")):
-    for address, resps in grouped_responses.items():
-        file_name = "{0}.txt".format(re.sub(r'[\s]', '_', address.lower()))
-        file_path = "{directory}/{file_name}".format(directory=directory, file_name=file_name)
-
-        if not os.path.exists(os.path.dirname(file_path)):
-            os.makedirs(os.path.dirname(file_path))
-
-        with open(file_path, 'w') as resps_file:
-            resps_file.write("\n\n###################################\n\n\n".join(
-                functools.reduce(
-                    lambda acc, entry: acc + "{0}: {1}\n".format(*entry),
-                    sorted(r.items()),
-                    "",
-                )
-                for r in resps
-            ))
+def address_file_name(address):
+    """Formats the file name of an address, shared by every spelling of it"""
+    return "{0}.txt".format(address_index.address_slug(address))
 
 
-def write_reports_to_disk(reports, compressed_grouped_responses, directory=os.path.abspath("./reports/reports_by_address/")):
-    for address, rep in reports.items():
-        # Format the file names from the address
-        file_name = "{0}.txt".format(re.sub(r'[\s]', '_', address.lower()))
-        file_path = "{directory}/{census_tract}/{file_name}".format(
-            directory=directory,
-            census_tract="ct_{0}".format(compressed_grouped_responses[address]['Census Tract'].replace('.', '')),
-            file_name=file_name,
-        )
+def format_grouped_resps(resps):
+    """Formats the responses of an address as the body of its grouped responses file"""
+    return "\n\n###################################\n\n\n".join(
+        "".join("{0}: {1}\n".format(*entry) for entry in sorted(r.items()))
+        for r in resps
+    )
 
-        if not os.path.exists(os.path.dirname(file_path)):
-            os.makedirs(os.path.dirname(file_path))
-            
-        with open(file_path, 'w') as report_file:
-            report_file.write(rep)
+
+def _write_with_manifest(files, directory, max_workers, manifest, prune):
+    """Writes files through a content-hash manifest of the directory
+
+    @param files Dictionary mapping canonical address to (path relative to the directory, content)
+    @param directory The output directory
+    @param max_workers The number of files written concurrently
+    @param manifest A `disk_writer.Manifest` shared across calls, loaded and saved here if `None`
+    @param prune Whether to remove the files of addresses not in `files`
+    @return A `disk_writer.WriteSummary`
+    """
+    owns_manifest = manifest is None
+    if owns_manifest:
+        manifest = disk_writer.Manifest(directory)
+
+    summary = manifest.write(files, max_workers=max_workers)
+    if prune:
+        summary = summary._replace(removed=summary.removed + manifest.prune(files.keys()))
+
+    if owns_manifest:
+        manifest.save()
+
+    metrics.count('files_written', summary.written)
+    metrics.count('files_skipped', summary.skipped)
+    metrics.count('files_removed', summary.removed)
+    metrics.count('bytes_written', summary.bytes_written)
+
+    return summary
+
+
+def write_grouped_resps_to_disk(
+    grouped_responses,
+    directory=os.path.abspath("./grouped_responses/"),
+    max_workers=disk_writer.DEFAULT_MAX_WORKERS,
+    manifest=None,
+    prune=True,
+):
+    return _write_with_manifest(
+        dict(
+            (address_index.canonical_address(address), (address_file_name(address), format_grouped_resps(resps)))
+            for address, resps in grouped_responses.items()
+        ),
+        directory, max_workers, manifest, prune,
+    )
+
+
+def write_reports_to_disk(
+    reports,
+    compressed_grouped_responses,
+    directory=os.path.abspath("./reports/reports_by_address/"),
+    max_workers=disk_writer.DEFAULT_MAX_WORKERS,
+    manifest=None,
+    prune=True,
+):
+    return _write_with_manifest(
+        dict(
+            (
+                address_index.canonical_address(address),
+                (
+                    "{census_tract}/{file_name}".format(
+                        census_tract="ct_{0}".format(compressed_grouped_responses[address]['Census Tract'].replace('.', '')),
+                        file_name=address_file_name(address),
+                    ),
+                    rep,
+                ),
+            )
+            for address, rep in reports.items()
+        ),
+        directory, max_workers, manifest, prune,
+    )
 
 
 ########
 # MAIN #
 ########
 
-if __name__ == "__main__":
-    responses_wks = service.main_spreadsheet.get_worksheet(0)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate C.A.R.E. contact reports")
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help="only fetch and reprocess responses submitted since the last incremental run",
+    )
+    parser.add_argument(
+        '--state-file', default=os.path.abspath("./.sync_state.json"),
+        help="where the incremental sync state is kept between runs",
+    )
+    parser.add_argument(
+        '--full-rebuild', action='store_true',
+        help="make the first incremental sync or watch poll re-read every response, picking up edits to older rows",
+    )
+    parser.add_argument(
+        '--rebuild-interval', type=float, default=None,
+        help="number of seconds after which an incremental sync or watch poll re-reads every response, a day by default",
+    )
+    parser.add_argument(
+        '--watch', action='store_true',
+        help="keep running and regenerate the reports of new responses as they are submitted",
+    )
+    parser.add_argument(
+        '--poll-interval', type=float, default=30.0,
+        help="number of seconds between two checks for new responses in watch mode",
+    )
+    parser.add_argument(
+        '--health-file', default=os.path.abspath("./reports/watch_health.json"),
+        help="where the health and metrics of watch mode are written as JSON after every poll",
+    )
+    parser.add_argument(
+        '--offline', action='store_true',
+        help="replay the responses from the last saved worksheet snapshot instead of the Sheets API",
+    )
+    parser.add_argument(
+        '--snapshot-dir', default=snapshot_cache.DEFAULT_SNAPSHOT_DIR,
+        help="where worksheet snapshots are kept",
+    )
+    parser.add_argument(
+        '--snapshot-max-age', type=float, default=None,
+        help="reuse a worksheet snapshot younger than this many seconds instead of fetching the sheet",
+    )
+    parser.add_argument(
+        '--streaming', action='store_true',
+        help="read the worksheet in row ranges and write each address as soon as it is complete",
+    )
+    parser.add_argument(
+        '--page-size', type=int, default=paged_reader.DEFAULT_PAGE_SIZE,
+        help="number of worksheet rows fetched per request",
+    )
+    parser.add_argument(
+        '--follow-up-days', type=int, default=None,
+        help="print the addresses whose last contact is older than this many days",
+    )
+    parser.add_argument(
+        '--write-workers', type=int, default=disk_writer.DEFAULT_MAX_WORKERS,
+        help="number of threads writing report and grouped response files",
+    )
+    parser.add_argument(
+        '--store', default=None,
+        help="also keep the formatted and compressed responses in this SQLite response store",
+    )
+    parser.add_argument(
+        '--max-in-flight', type=int, default=concurrent_fetch.DEFAULT_MAX_IN_FLIGHT,
+        help="maximum number of worksheets fetched concurrently",
+    )
+    parser.add_argument(
+        '--summary-sheet', nargs='?', const=summary_sheet.DEFAULT_SUMMARY_TITLE, default=None,
+        help="write one summary row per address to this worksheet of the main spreadsheet",
+    )
+    parser.add_argument(
+        '--summary-batch-size', type=int, default=summary_sheet.DEFAULT_BATCH_SIZE,
+        help="maximum number of summary rows sent per batched update",
+    )
+    parser.add_argument(
+        '--grouped-dir', default=os.path.abspath("./grouped_responses/"),
+        help="where the grouped responses of each address are written",
+    )
+    parser.add_argument(
+        '--reports-dir', default=os.path.abspath("./reports/reports_by_address/"),
+        help="where the report of each address is written, by census tract",
+    )
+    parser.add_argument(
+        '--tract-summary', default=tract_rollups.DEFAULT_SUMMARY_PATH,
+        help="where the per census tract totals are written as CSV",
+    )
+    parser.add_argument(
+        '--export-jsonl', default=None,
+        help="also export every grouped and compressed response to this JSON Lines file, gzipped if it ends with .gz",
+    )
+    parser.add_argument(
+        '--export-csv', default=None,
+        help="also export every grouped and compressed response to this CSV file, gzipped if it ends with .gz",
+    )
+    parser.add_argument(
+        '--report-archives', action='store_true',
+        help="pack the reports of each census tract into a single archive instead of one file per address",
+    )
+    parser.add_argument(
+        '--archive-dir', default=os.path.abspath("./reports/report_archives/"),
+        help="where the census tract report archives are written",
+    )
+    parser.add_argument(
+        '--jobs', type=int, default=1,
+        help="number of worker processes the addresses are sharded across",
+    )
+    parser.add_argument(
+        '--metrics-file', default=os.path.abspath("./reports/run_metrics.json"),
+        help="where the JSON summary of the per-stage metrics of the run is written",
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help="run under cProfile and tracemalloc and dump their results to --profile-dir",
+    )
+    parser.add_argument(
+        '--profile-dir', default=os.path.abspath("./profile/"),
+        help="where the profiling results are written",
+    )
+    args = parser.parse_args(argv)
+
+    run_metrics = metrics.reset()
+    if args.profile:
+        with metrics.profile(args.profile_dir):
+            run(args)
+    else:
+        run(args)
+
+    run_metrics.write_json(args.metrics_file)
+
+
+def run(args):
+    if (args.export_jsonl or args.export_csv) and (args.incremental or args.watch or args.streaming or args.jobs > 1):
+        raise Exception("--export-jsonl and --export-csv are only supported by full, single process runs")
+    if args.report_archives and (args.incremental or args.watch or args.streaming or args.jobs > 1):
+        raise Exception("--report-archives is only supported by full, single process runs")
+    if args.follow_up_days is not None and (args.incremental or args.watch or args.streaming):
+        raise Exception("--follow-up-days is not supported with --incremental, --watch or --streaming")
+    if args.store and (args.incremental or args.watch or args.streaming):
+        raise Exception("--store is not supported with --incremental, --watch or --streaming")
+    if args.summary_sheet and (args.incremental or args.watch or args.streaming):
+        raise Exception("--summary-sheet is not supported with --incremental, --watch or --streaming")
+
+    sources = service.get_worksheet_sources()
+    logger.info("Generating Reports for {0} worksheet(s)".format(len(sources)))
+
+    with metrics.stage('fetch'):
+        if args.offline:
+            fetch = lambda spreadsheet_id, worksheet: snapshot_cache.offline_worksheet(
+                spreadsheet_id, worksheet, args.snapshot_dir,
+            )
+        elif args.incremental or args.streaming or args.watch:
+            # Incremental, streaming and watch runs fetch rows in ranges, so they bypass the snapshot cache
+            fetch = service.open_worksheet
+        else:
+            fetch = lambda spreadsheet_id, worksheet: snapshot_cache.cached_worksheet(
+                service.open_worksheet(spreadsheet_id, worksheet),
+                spreadsheet_id, worksheet,
+                max_age=args.snapshot_max_age,
+                directory=args.snapshot_dir,
+            )
+
+        responses_worksheets = concurrent_fetch.fetch_all(sources, fetch, args.max_in_flight)
+
+    # Each spreadsheet may have been filled in with its own version of the forms
+    forms_versions = [service.get_forms_version(spreadsheet_id) for spreadsheet_id, _ in sources]
+
+    if (args.incremental or args.watch) and len(responses_worksheets) != 1:
+        raise Exception("Incremental sync only supports a single response worksheet, {0} are configured".format(
+            len(responses_worksheets),
+        ))
+
+    if args.incremental or args.watch:
+        import incremental_sync
+        rebuild_interval = args.rebuild_interval
+        if rebuild_interval is None:
+            rebuild_interval = incremental_sync.DEFAULT_REBUILD_INTERVAL
+
+    if args.watch:
+        import watcher
+        responses_watcher = watcher.Watcher(
+            responses_worksheets[0], args.state_file,
+            poll_interval=args.poll_interval,
+            health_path=args.health_file,
+            grouped_directory=args.grouped_dir,
+            reports_directory=args.reports_dir,
+            tract_summary_path=args.tract_summary,
+            forms_version=forms_versions[0],
+            page_size=args.page_size,
+            full_rebuild=args.full_rebuild,
+            rebuild_interval=rebuild_interval,
+        )
+        responses_watcher.install_signal_handlers()
+        responses_watcher.run()
+        return
+
+    if args.incremental:
+        with metrics.stage('incremental_sync'):
+            incremental_sync.sync(
+                responses_worksheets[0], args.state_file,
+                grouped_directory=args.grouped_dir,
+                reports_directory=args.reports_dir,
+                tract_summary_path=args.tract_summary,
+                forms_version=forms_versions[0],
+                page_size=args.page_size,
+                full_rebuild=args.full_rebuild,
+                rebuild_interval=rebuild_interval,
+            )
+        return
+
+    if args.streaming:
+        import streaming
+        with metrics.stage('streaming'):
+            streaming.stream_reports(
+                responses_worksheets, page_size=args.page_size,
+                grouped_directory=args.grouped_dir,
+                reports_directory=args.reports_dir,
+                tract_summary_path=args.tract_summary,
+                forms_versions=forms_versions,
+            )
+        return
+
+    if args.jobs > 1:
+        if args.store or args.summary_sheet or args.follow_up_days is not None:
+            raise Exception("--store, --summary-sheet and --follow-up-days are not supported with --jobs")
+
+        import sharding
+        with metrics.stage('sharded'):
+            sharding.run_sharded(
+                responses_worksheets, args.jobs,
+                grouped_directory=args.grouped_dir,
+                reports_directory=args.reports_dir,
+                tract_summary_path=args.tract_summary,
+                write_workers=args.write_workers,
+                forms_versions=forms_versions,
+            )
+        return
+
+    history = contact_history.ContactHistory()
+    rollup = tract_rollups.TractRollup()
+
+    # Responses from every worksheet are merged before grouping
+    with metrics.stage('format_responses'):
+        formatted_resps = [
+            resp
+            for responses_wks, forms_version in zip(responses_worksheets, forms_versions)
+            for resp in format_responses(responses_wks, args.page_size, forms_version)
+        ]
+    with metrics.stage('group_responses_by_address'):
+        grouped_resps = group_responses_by_address(formatted_resps, history)
+    with metrics.stage('compress_grouped_responses'):
+        compressed_grouped_resps = compress_grouped_responses(grouped_resps, rollup)
+
+    with metrics.stage('generate_reports'):
+        reports = generate_reports(grouped_resps, compressed_grouped_resps, history=history)
+
+    with metrics.stage('write_grouped_resps_to_disk'):
+        grouped_write_summary = write_grouped_resps_to_disk(
+            grouped_resps, args.grouped_dir, max_workers=args.write_workers,
+        )
+    if args.report_archives:
+        import report_archives
+        with metrics.stage('write_report_archives'):
+            reports_write_summary = report_archives.write_report_archives(
+                reports, compressed_grouped_resps, args.archive_dir, max_workers=args.write_workers,
+            )
+    else:
+        with metrics.stage('write_reports_to_disk'):
+            reports_write_summary = write_reports_to_disk(
+                reports, compressed_grouped_resps, args.reports_dir, max_workers=args.write_workers,
+            )
+
+    with metrics.stage('write_tract_summary'):
+        rollup.write_csv(args.tract_summary)
+
+    if args.export_jsonl or args.export_csv:
+        import bulk_export
+        with metrics.stage('bulk_export'):
+            metrics.count('records_exported', bulk_export.export_responses(
+                grouped_resps, compressed_grouped_resps, jsonl_path=args.export_jsonl, csv_path=args.export_csv,
+            ))
 
-    formatted_resps = format_responses(responses_wks)
-    grouped_resps = group_responses_by_address(formatted_resps)
-    compressed_grouped_resps = compress_grouped_responses(grouped_resps)
+    write_summary = disk_writer.merge_summaries([grouped_write_summary, reports_write_summary])
+    logger.info("Files written: {0.written}, skipped: {0.skipped}, removed: {0.removed}".format(write_summary))
+
+    if args.store:
+        with metrics.stage('store'):
+            with response_store.ResponseStore(args.store) as store:
+                # Every response was read, so the ones no longer in the sheet are pruned
+                store.upsert_responses(formatted_resps, address_extractor, prune=True)
+                store.upsert_compressed_responses(compressed_grouped_resps, prune=True)
+
+    if args.summary_sheet:
+        with metrics.stage('summary_sheet'):
+            summary_wks = summary_sheet.open_summary_worksheet(service.get_main_spreadsheet(), args.summary_sheet)
+            metrics.count('summary_rows_updated', summary_sheet.write_summary(
+                summary_wks,
+                summary_sheet.build_summary_rows(compressed_grouped_resps, history),
+                batch_size=args.summary_batch_size,
+            ))
 
-    reports = generate_reports(grouped_resps, compressed_grouped_resps)
+    if args.follow_up_days is not None:
+        for address in history.stale_addresses(args.follow_up_days):
+            print(address)
 
-    write_grouped_resps_to_disk(grouped_resps)
-    write_reports_to_disk(reports, compressed_grouped_resps)
+
+if __name__ == "__main__":
+    main()
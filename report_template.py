@@ -0,0 +1,94 @@
+import functools
+import string
+
+
+class ReportTemplate:
+    """Render plan compiled from a report template
+
+    A template is a list of sections, each a list of lines using `str.format` fields. A line is only
+    rendered if every field it uses is present in the report data, and empty sections are dropped.
+    """
+
+    def __init__(self, template):
+        self.sections = [
+            [self._compile_line(line) for line in section]
+            for section in template
+        ]
+
+    @staticmethod
+    def _compile_line(line):
+        """Splits a line into literal text and the fields substituted into it
+
+        @param line The template line
+        @return (names of the fields the line needs, list of literal strings and field tuples)
+        """
+        required_fields = []
+        parts = []
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(line):
+            if literal:
+                parts.append(literal)
+            if field_name is None:
+                continue
+
+            if not field_name.isidentifier():
+                raise ValueError("Report template fields must be plain names: {0!r}".format(line))
+
+            required_fields.append(field_name)
+            parts.append((field_name, format_spec, conversion))
+
+        return tuple(required_fields), parts
+
+    def render(self, report_data):
+        """Fills the template with report data
+
+        @param report_data Mapping from field name to value, missing fields drop the lines using them
+        @return The rendered report
+        """
+        rendered_sections = []
+        for section in self.sections:
+            rendered_lines = []
+            for required_fields, parts in section:
+                if not all(field in report_data for field in required_fields):
+                    continue
+
+                rendered_line = ''.join(
+                    part if isinstance(part, str) else _render_field(report_data, *part)
+                    for part in parts
+                )
+                if rendered_line:
+                    rendered_lines.append(rendered_line)
+
+            if rendered_lines:
+                rendered_sections.append('\n'.join(rendered_lines))
+
+        return '\n\n'.join(rendered_sections)
+
+
+def _render_field(report_data, field_name, format_spec, conversion):
+    value = report_data[field_name]
+
+    if conversion == 'r':
+        value = repr(value)
+    elif conversion == 's':
+        value = str(value)
+    elif conversion == 'a':
+        value = ascii(value)
+
+    return format(value, format_spec)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_cached(frozen_template):
+    return ReportTemplate(frozen_template)
+
+
+def compile_template(template):
+    """Compiles a report template, reusing the render plan of templates already compiled
+
+    @param template A list of sections, each a list of lines, or an already compiled `ReportTemplate`
+    @return A `ReportTemplate`
+    """
+    if isinstance(template, ReportTemplate):
+        return template
+
+    return _compile_cached(tuple(tuple(section) for section in template))
@@ -0,0 +1,268 @@
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+
+import address_index
+
+
+DEFAULT_STORE_PATH = os.path.abspath("./responses.sqlite3")
+
+# Stores of older versions only hold data derived from the sheet, so they are dropped and refilled
+SCHEMA_VERSION = 2
+DROP_SCHEMA = """
+DROP TABLE IF EXISTS responses;
+DROP TABLE IF EXISTS compressed_responses;
+"""
+
+# Rows are keyed by the canonical address, `address` is the spelling displayed
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    address_key TEXT NOT NULL,
+    address TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    census_tract TEXT,
+    contact_type TEXT,
+    date_of_contact TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (address_key, timestamp)
+);
+CREATE INDEX IF NOT EXISTS responses_census_tract ON responses (census_tract);
+CREATE INDEX IF NOT EXISTS responses_contact_type ON responses (contact_type, date_of_contact);
+CREATE INDEX IF NOT EXISTS responses_date_of_contact ON responses (date_of_contact);
+
+CREATE TABLE IF NOT EXISTS compressed_responses (
+    address_key TEXT PRIMARY KEY,
+    address TEXT NOT NULL,
+    census_tract TEXT,
+    is_in_compliance TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS compressed_responses_census_tract
+    ON compressed_responses (census_tract, is_in_compliance);
+"""
+
+
+################
+# HELPER FUNCS #
+################
+
+def _serialize_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+
+    raise TypeError("Cannot serialize {0!r}".format(value))
+
+
+def _serialize(resp):
+    return json.dumps(dict(resp), default=_serialize_value, sort_keys=True)
+
+
+def _format_date(date):
+    return date.isoformat() if date is not None else None
+
+
+########################
+# RESPONSE STORE CLASS #
+########################
+
+class ResponseStore:
+    """Local SQLite store of formatted and compressed responses
+
+    Responses are identified by their canonical address and form submission timestamp, so storing the
+    responses of repeated runs only writes the rows that are new or changed. Full runs prune the rows
+    no longer in the sheet, e.g. after an address was corrected.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.connection = sqlite3.connect(path)
+
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.connection.executescript(DROP_SCHEMA)
+            self.connection.execute("PRAGMA user_version = {0}".format(SCHEMA_VERSION))
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _prune(self, table, key_columns, keys):
+        """Deletes the rows of a table whose key is not in `keys`, within the current transaction"""
+        self.connection.execute("DROP TABLE IF EXISTS temp.kept_keys")
+        self.connection.execute(
+            "CREATE TEMP TABLE kept_keys ({0}, PRIMARY KEY ({0}))".format(", ".join(key_columns))
+        )
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO temp.kept_keys VALUES ({0})".format(", ".join("?" * len(key_columns))),
+            keys,
+        )
+        self.connection.execute(
+            "DELETE FROM {0} WHERE NOT EXISTS (SELECT 1 FROM temp.kept_keys WHERE {1})".format(
+                table, " AND ".join("kept_keys.{1} = {0}.{1}".format(table, column) for column in key_columns),
+            )
+        )
+        self.connection.execute("DROP TABLE temp.kept_keys")
+
+    def upsert_responses(self, formatted_resps, address_extractor, prune=False):
+        """Stores formatted responses
+
+        @param formatted_resps The formatted responses to store
+        @param address_extractor Function extracting the address of a response
+        @param prune Whether to delete the stored responses not in `formatted_resps`, for full runs
+        """
+        rows = []
+        for resp in formatted_resps:
+            address = address_extractor(resp)
+            rows.append((
+                address_index.canonical_address(address),
+                address,
+                _format_date(resp['Timestamp']),
+                resp.get('Census Tract'),
+                resp.get('Type of Contact'),
+                _format_date(resp.get('Date of Contact')),
+                _serialize(resp),
+            ))
+
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO responses (
+                    address_key, address, timestamp, census_tract, contact_type, date_of_contact, data
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (address_key, timestamp) DO UPDATE SET
+                    address = excluded.address,
+                    census_tract = excluded.census_tract,
+                    contact_type = excluded.contact_type,
+                    date_of_contact = excluded.date_of_contact,
+                    data = excluded.data
+                WHERE data != excluded.data
+                """,
+                rows,
+            )
+
+            if prune:
+                self._prune('responses', ['address_key', 'timestamp'], [row[0:1] + row[2:3] for row in rows])
+
+    def upsert_compressed_responses(self, compressed_grouped_resps, prune=False):
+        """Stores compressed responses
+
+        @param compressed_grouped_resps Dictionary mapping address to its compressed response
+        @param prune Whether to delete the stored addresses not in `compressed_grouped_resps`, for full runs
+        """
+        rows = [
+            (
+                address_index.canonical_address(address), address,
+                resp.get('Census Tract'), resp.get('Compliance?'), _serialize(resp),
+            )
+            for address, resp in compressed_grouped_resps.items()
+        ]
+
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO compressed_responses (address_key, address, census_tract, is_in_compliance, data)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (address_key) DO UPDATE SET
+                    address = excluded.address,
+                    census_tract = excluded.census_tract,
+                    is_in_compliance = excluded.is_in_compliance,
+                    data = excluded.data
+                WHERE data != excluded.data OR address != excluded.address
+                """,
+                rows,
+            )
+
+            if prune:
+                self._prune('compressed_responses', ['address_key'], [row[:1] for row in rows])
+
+    def non_compliant_addresses(self, census_tract=None):
+        """Addresses not in compliance, optionally within a single census tract
+
+        @param census_tract The census tract to look in
+        @return List of (address, census tract) tuples
+        """
+        query = "SELECT address, census_tract FROM compressed_responses WHERE IFNULL(is_in_compliance, '') != 'Yes'"
+        params = []
+        if census_tract is not None:
+            query += " AND census_tract = ?"
+            params.append(census_tract)
+
+        return self.connection.execute(query + " ORDER BY address", params).fetchall()
+
+    def contacts(self, start=None, end=None, contact_type=None, census_tract=None):
+        """Contacts made within a date range
+
+        @param start The earliest date of contact, inclusive
+        @param end The latest date of contact, inclusive
+        @param contact_type Only return contacts of this type
+        @param census_tract Only return contacts within this census tract
+        @return List of (date of contact, address, type of contact, census tract) tuples
+        """
+        conditions = []
+        params = []
+        for condition, param in [
+            ("date_of_contact >= ?", _format_date(start)),
+            ("date_of_contact <= ?", _format_date(end)),
+            ("contact_type = ?", contact_type),
+            ("census_tract = ?", census_tract),
+        ]:
+            if param is not None:
+                conditions.append(condition)
+                params.append(param)
+
+        query = "SELECT date_of_contact, address, contact_type, census_tract FROM responses"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        return self.connection.execute(query + " ORDER BY date_of_contact, address", params).fetchall()
+
+
+########
+# MAIN #
+########
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the local C.A.R.E. response store")
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH, help="path of the SQLite response store")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    non_compliant_parser = subparsers.add_parser('non-compliant', help="list the addresses not in compliance")
+    non_compliant_parser.add_argument('--tract', help="only list addresses in this census tract")
+
+    contacts_parser = subparsers.add_parser('contacts', help="list the contacts made within a date range")
+    contacts_parser.add_argument('--start', help="earliest date of contact, M/D/YYYY")
+    contacts_parser.add_argument('--end', help="latest date of contact, M/D/YYYY")
+    contacts_parser.add_argument('--type', help="only list contacts of this type")
+    contacts_parser.add_argument('--tract', help="only list contacts in this census tract")
+
+    args = parser.parse_args(argv)
+
+    parse_date = lambda date: datetime.datetime.strptime(date, "%m/%d/%Y") if date else None
+
+    with ResponseStore(args.store) as store:
+        if args.command == 'non-compliant':
+            rows = store.non_compliant_addresses(args.tract)
+        else:
+            end = parse_date(args.end)
+            rows = store.contacts(
+                start=parse_date(args.start),
+                # Include every contact made on the last day
+                end=end.replace(hour=23, minute=59, second=59) if end else None,
+                contact_type=args.type,
+                census_tract=args.tract,
+            )
+
+    for row in rows:
+        print("\t".join(str(val) if val is not None else '' for val in row))
+
+
+if __name__ == "__main__":
+    main()
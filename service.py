@@ -1,30 +1,238 @@
 import json
 import os
+import threading
 
-from oauth2client.service_account import ServiceAccountCredentials
 
-import gspread
+CONFIG_PATH = os.path.abspath('./config.json')
+CREDENTIALS_PATH = 'credentials.json'
 
+_lock = threading.RLock()
+_config_store = None
+_backend = None
+_spreadsheet_client = None
+_spreadsheets = {}
 
-config_store = None
-spreadsheet_client = None
-forms_version = None
-main_spreadsheet = None
-main_spreadsheet_name = None
 
 def get_credentials():
     """Gets credentials needed to access the spreadsheet"""
+    from oauth2client.service_account import ServiceAccountCredentials
+
     scope = ['https://spreadsheets.google.com/feeds']
-    credentials = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', scope)
+    credentials = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_PATH, scope)
 
     return credentials
 
 
-# Load the config
-with open(os.path.abspath('./config.json'), "r") as f:
-    config_store = json.loads(f.read())
+def gspread_backend():
+    """Default backend, authorizes a gspread client with the service account credentials"""
+    import gspread
+
+    return gspread.authorize(get_credentials())
+
+
+#################
+# LOCAL BACKEND #
+#################
+
+class LocalWorksheet:
+    """In-memory stand-in for a gspread worksheet"""
+
+    def __init__(self, rows, title=None):
+        self._rows = rows
+        self.title = title
+
+    @property
+    def row_count(self):
+        return len(self._rows)
+
+    def row_values(self, row_idx):
+        return self._rows[row_idx - 1] if row_idx <= len(self._rows) else []
+
+    def get_all_values(self):
+        return self._rows
+
+    def get_values(self, range_name):
+        first_row, last_row = (int(idx) for idx in range_name.split(':'))
+        return self._rows[first_row - 1:last_row]
+
+    def add_rows(self, num_rows):
+        self._rows.extend([] for _ in range(num_rows))
+
+    def batch_update(self, data):
+        """Writes ranges of values, each given as {'range': 'A1:C2', 'values': [[...], ...]}"""
+        for update in data:
+            first_cell = update['range'].split(':')[0]
+            first_col = sum(
+                (ord(letter) - ord('A') + 1) * 26 ** idx
+                for idx, letter in enumerate(reversed(first_cell.rstrip('0123456789')))
+            ) - 1
+            first_row = int(first_cell[len(first_cell.rstrip('0123456789')):]) - 1
+
+            for row_offset, values in enumerate(update['values']):
+                row = self._rows[first_row + row_offset]
+                row.extend([''] * (first_col + len(values) - len(row)))
+                row[first_col:first_col + len(values)] = values
+
+
+class LocalSpreadsheet:
+    """In-memory stand-in for a gspread spreadsheet"""
+
+    def __init__(self, key, worksheets, title=None):
+        self.id = key
+        self.title = title
+        self._worksheets = worksheets
+
+    def get_worksheet(self, index):
+        return self._worksheets[index]
+
+    def worksheet(self, title):
+        return next(wks for wks in self._worksheets if wks.title == title)
+
+    def worksheets(self):
+        return list(self._worksheets)
+
+    def add_worksheet(self, title, rows, cols):
+        self._worksheets.append(LocalWorksheet([[] for _ in range(rows)], title=title))
+        return self._worksheets[-1]
+
+
+class LocalClient:
+    """In-memory stand-in for an authorized gspread client"""
+
+    def __init__(self, spreadsheets):
+        self._spreadsheets = dict((spreadsheet.id, spreadsheet) for spreadsheet in spreadsheets)
+
+    def open_by_key(self, key):
+        return self._spreadsheets[key]
+
+
+##################
+# SERVICE ACCESS #
+##################
+
+def configure(config=None, backend=None):
+    """Overrides the config and/or the client backend, dropping any cached client
+
+    @param config Mapping to use instead of `config.json`
+    @param backend Callable creating the spreadsheet client, e.g. `lambda: LocalClient([...])`
+    """
+    global _config_store, _backend, _spreadsheet_client
+
+    with _lock:
+        if config is not None:
+            _config_store = config
+        if backend is not None:
+            _backend = backend
+
+        _spreadsheet_client = None
+        _spreadsheets.clear()
+
+
+def get_config():
+    """Loads the config on first use"""
+    global _config_store
+
+    # Avoid taking the lock once the config is loaded, it is looked up for every response
+    if _config_store is not None:
+        return _config_store
+
+    with _lock:
+        if _config_store is None:
+            with open(CONFIG_PATH, "r") as f:
+                _config_store = json.loads(f.read())
+
+        return _config_store
+
+
+def get_client():
+    """Creates the spreadsheet client on first use and reuses it afterwards"""
+    global _spreadsheet_client
+
+    with _lock:
+        if _spreadsheet_client is None:
+            _spreadsheet_client = (_backend or gspread_backend)()
+
+        return _spreadsheet_client
+
+
+def open_spreadsheet(key):
+    """Opens a spreadsheet by its key, reusing already opened spreadsheets"""
+    spreadsheet = _spreadsheets.get(key)
+    if spreadsheet is not None:
+        return spreadsheet
+
+    # Open outside of the lock so different spreadsheets can be opened concurrently
+    spreadsheet = get_client().open_by_key(key)
+
+    with _lock:
+        return _spreadsheets.setdefault(key, spreadsheet)
+
+
+def open_worksheet(spreadsheet_id, worksheet):
+    """Opens a worksheet by its index or title
+
+    @param spreadsheet_id The key of the spreadsheet
+    @param worksheet The index or title of the worksheet
+    @return The worksheet
+    """
+    spreadsheet = open_spreadsheet(spreadsheet_id)
+    if isinstance(worksheet, int):
+        return spreadsheet.get_worksheet(worksheet)
+
+    return spreadsheet.worksheet(worksheet)
+
+
+def get_worksheet_sources():
+    """Lists the worksheets holding form responses
+
+    The config may list several spreadsheets, e.g. one per program year or district, each with the
+    indices or titles of its response worksheets. Without a list, the first worksheet of the main
+    spreadsheet is used.
+
+    @return List of (spreadsheet id, worksheet index or title) tuples
+    """
+    config = get_config()
+    spreadsheets = config.get('spreadsheets') or [config['main_spreadsheet']]
+
+    return [
+        (spreadsheet['id'], worksheet)
+        for spreadsheet in spreadsheets
+        for worksheet in spreadsheet.get('worksheets', [0])
+    ]
+
+
+def get_forms_version(spreadsheet_id=None):
+    """Looks up the forms version responses were filled in with
+
+    @param spreadsheet_id Key of a spreadsheet listed under `spreadsheets`, whose `forms_version`
+                          overrides the one of the config
+    @return The name of the forms version
+    """
+    config = get_config()
+
+    for spreadsheet in config.get('spreadsheets') or []:
+        if spreadsheet['id'] == spreadsheet_id and spreadsheet.get('forms_version'):
+            return spreadsheet['forms_version']
+
+    return config['forms_version']
+
+
+def get_main_spreadsheet():
+    return open_spreadsheet(get_config()['main_spreadsheet']['id'])
+
+
+# Lazily resolved module attributes kept for backwards compatibility
+_lazy_attributes = {
+    'config_store': get_config,
+    'spreadsheet_client': get_client,
+    'forms_version': get_forms_version,
+    'main_spreadsheet': get_main_spreadsheet,
+    'main_spreadsheet_name': lambda: get_config()['main_spreadsheet']['name'],
+}
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        return _lazy_attributes[name]()
 
-spreadsheet_client = gspread.authorize(get_credentials())
-forms_version = config_store['forms_version']
-main_spreadsheet = spreadsheet_client.open_by_key(config_store['main_spreadsheet']['id'])
-main_spreadsheet_name = config_store['main_spreadsheet']['name']
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
@@ -0,0 +1,184 @@
+import concurrent.futures
+import logging
+import os
+import zlib
+
+import address_index
+import contact_history
+import disk_writer
+import metrics
+import normalizers
+import report_generator
+import service
+import tract_rollups
+
+logger = logging.getLogger("das-care-contact-forms-logger")
+
+
+################
+# HELPER FUNCS #
+################
+
+def shard_of(address, num_shards):
+    """Picks the shard of an address, the same in every process unlike the salted `hash`
+
+    Every spelling of an address lands in the same shard, so it is grouped as in a serial run.
+    """
+    return zlib.crc32(address_index.canonical_address(address).encode('utf-8')) % num_shards
+
+
+def shard_rows(worksheets_values, num_shards, forms_versions=None):
+    """Splits the raw rows of several worksheets into shards by address
+
+    @param worksheets_values The values of each worksheet, header row first
+    @param num_shards The number of shards
+    @param forms_versions The name of the forms version of each worksheet, defaults to the config's
+    @return List with, for each shard, a list of (header, rows, forms version) tuples, one per worksheet
+    """
+    forms_versions = forms_versions or [None] * len(worksheets_values)
+
+    shards = [[] for _ in range(num_shards)]
+    for values, forms_version in zip(worksheets_values, forms_versions):
+        if not values:
+            continue
+
+        header = values[0]
+        plan = normalizers.compile_plan(header, forms_version)
+        rows_by_shard = [[] for _ in range(num_shards)]
+        for row in values[1:]:
+            address = plan.raw_address(row)
+
+            # Rows without an address go to the first shard, where they are logged and counted as dropped
+            rows_by_shard[shard_of(address, num_shards) if address else 0].append(row)
+
+        for shard, rows in zip(shards, rows_by_shard):
+            shard.append((header, rows, forms_version))
+
+    return shards
+
+
+def _process_shard(task):
+    """Formats, compresses, renders and writes the addresses of a shard, in a worker process
+
+    The shared manifests are only read here, the updated entries are returned to be saved once. Files
+    of addresses that moved are removed by the parent once every worker is done, as workers share the
+    census tract directories.
+    """
+    config, shard, grouped_directory, reports_directory, write_workers = task
+
+    service.configure(config=config)
+    shard_metrics = metrics.reset()
+
+    history = contact_history.ContactHistory()
+    rollup = tract_rollups.TractRollup()
+
+    with metrics.stage('format_responses'):
+        formatted_resps = [
+            resp
+            for header, rows, forms_version in shard
+            for resp in report_generator.format_rows(header, rows, forms_version)
+        ]
+    with metrics.stage('group_responses_by_address'):
+        grouped_resps = report_generator.group_responses_by_address(formatted_resps, history)
+    with metrics.stage('compress_grouped_responses'):
+        compressed_grouped_resps = report_generator.compress_grouped_responses(grouped_resps, rollup)
+
+    with metrics.stage('generate_reports'):
+        reports = report_generator.generate_reports(grouped_resps, compressed_grouped_resps, history=history)
+
+    grouped_manifest = disk_writer.Manifest(grouped_directory, defer_removals=True)
+    reports_manifest = disk_writer.Manifest(reports_directory, defer_removals=True)
+
+    with metrics.stage('write_grouped_resps_to_disk'):
+        report_generator.write_grouped_resps_to_disk(
+            grouped_resps, grouped_directory, write_workers, manifest=grouped_manifest, prune=False,
+        )
+    with metrics.stage('write_reports_to_disk'):
+        report_generator.write_reports_to_disk(
+            reports, compressed_grouped_resps, reports_directory, write_workers, manifest=reports_manifest, prune=False,
+        )
+
+    # The manifests are keyed by canonical address
+    address_keys = [address_index.canonical_address(address) for address in grouped_resps]
+
+    return {
+        'addresses': address_keys,
+        'grouped_manifest_entries': dict((key, grouped_manifest.entries[key]) for key in address_keys),
+        'reports_manifest_entries': dict((key, reports_manifest.entries[key]) for key in address_keys),
+        'grouped_deferred_removals': grouped_manifest.deferred_removals,
+        'reports_deferred_removals': reports_manifest.deferred_removals,
+        'tract_rollup': rollup.to_state(),
+        'metrics': shard_metrics.summary(),
+    }
+
+
+################
+# SHARDED RUNS #
+################
+
+def run_sharded(
+    responses_worksheets,
+    jobs,
+    grouped_directory=os.path.abspath("./grouped_responses/"),
+    reports_directory=os.path.abspath("./reports/reports_by_address/"),
+    tract_summary_path=tract_rollups.DEFAULT_SUMMARY_PATH,
+    write_workers=disk_writer.DEFAULT_MAX_WORKERS,
+    forms_versions=None,
+):
+    """Generates and writes the reports of every address from a pool of worker processes
+
+    Addresses are sharded by a stable hash, and the results of the shards are merged in shard order,
+    so the output is identical to the serial pipeline.
+
+    @param responses_worksheets The worksheets to load data from, their responses are merged
+    @param jobs The number of worker processes, and of shards
+    @param grouped_directory Where the grouped responses are written
+    @param reports_directory Where the reports are written
+    @param tract_summary_path Where the census tract totals are written
+    @param write_workers The number of threads writing files in each worker process
+    @param forms_versions The name of the forms version of each worksheet, defaults to the config's
+    @return The number of addresses processed
+    """
+    with metrics.stage('shard_rows'):
+        shards = shard_rows([wks.get_all_values() for wks in responses_worksheets], jobs, forms_versions)
+
+    config = service.get_config()
+    tasks = [
+        (config, shard, grouped_directory, reports_directory, write_workers)
+        for shard in shards
+    ]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(_process_shard, tasks))
+
+    with metrics.stage('merge_shards'):
+        addresses = [address for result in results for address in result['addresses']]
+
+        grouped_manifest = disk_writer.Manifest(grouped_directory)
+        reports_manifest = disk_writer.Manifest(reports_directory)
+        contributions = {}
+        for result in results:
+            grouped_manifest.entries.update(result['grouped_manifest_entries'])
+            reports_manifest.entries.update(result['reports_manifest_entries'])
+            contributions.update(result['tract_rollup'])
+            metrics.current().merge(result['metrics'])
+
+        # Every worker is done, so removing the files of addresses that moved cannot race with a write
+        metrics.count('files_removed', sum([
+            grouped_manifest.prune(addresses),
+            reports_manifest.prune(addresses),
+            grouped_manifest.remove_deferred(
+                [rel_path for result in results for rel_path in result['grouped_deferred_removals']]
+            ),
+            reports_manifest.remove_deferred(
+                [rel_path for result in results for rel_path in result['reports_deferred_removals']]
+            ),
+        ]))
+        grouped_manifest.save()
+        reports_manifest.save()
+
+        tract_rollups.TractRollup.from_state(contributions).write_csv(tract_summary_path)
+
+    logger.info("Generated reports for %d addresses in %d shards" % (len(addresses), jobs))
+
+    return len(addresses)
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import re
+import time
+
+import paged_reader
+import service
+
+logger = logging.getLogger("das-care-contact-forms-logger")
+
+DEFAULT_SNAPSHOT_DIR = os.path.abspath("./.snapshots/")
+
+
+class SnapshotWorksheet(service.LocalWorksheet):
+    """Read-only worksheet adapter that serves rows from a snapshot instead of the Sheets API"""
+
+
+################
+# HELPER FUNCS #
+################
+
+def snapshot_path(spreadsheet_id, worksheet, directory=DEFAULT_SNAPSHOT_DIR):
+    """Builds the snapshot file path of a worksheet
+
+    @param spreadsheet_id The key of the spreadsheet the worksheet belongs to
+    @param worksheet The index or title of the worksheet in the spreadsheet
+    @param directory The directory the snapshots are kept in
+    @return The path of the snapshot file
+    """
+    file_name = "{0}__{1}.jsonl".format(
+        re.sub(r'[^\w\-]', '_', str(spreadsheet_id)),
+        re.sub(r'[^\w\-]', '_', str(worksheet)),
+    )
+
+    return os.path.join(directory, file_name)
+
+
+def save_snapshot(path, rows, metadata):
+    """Atomically writes a snapshot as JSON lines, metadata first and then one line per row
+
+    @param path The path of the snapshot file
+    @param rows The raw worksheet rows, including the header row
+    @param metadata Mapping describing where and when the rows were fetched
+    """
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    tmp_path = "{0}.tmp".format(path)
+    with open(tmp_path, 'w') as snapshot_file:
+        snapshot_file.write(json.dumps(metadata) + "\n")
+        snapshot_file.writelines(json.dumps(row, separators=(',', ':')) + "\n" for row in rows)
+
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """Reads a snapshot written by `save_snapshot`
+
+    @param path The path of the snapshot file
+    @return (metadata, rows)
+    """
+    with open(path, 'r') as snapshot_file:
+        metadata = json.loads(snapshot_file.readline())
+        rows = [json.loads(line) for line in snapshot_file]
+
+    return metadata, rows
+
+
+def is_fresh(metadata, max_age, wks=None):
+    """Checks whether a snapshot can be reused instead of fetching the worksheet again
+
+    @param metadata The metadata of the snapshot
+    @param max_age The maximum age of the snapshot in seconds
+    @param wks The live worksheet, whose last update time is compared when it is known
+    @return Whether the snapshot is fresh
+    """
+    if time.time() - metadata['fetched_at'] > max_age:
+        return False
+
+    updated = getattr(wks, 'updated', None)
+    return updated is None or updated == metadata.get('updated')
+
+
+########################
+# SNAPSHOT CACHE FUNCS #
+########################
+
+def cached_worksheet(wks, spreadsheet_id, worksheet, max_age=None, directory=DEFAULT_SNAPSHOT_DIR):
+    """Serves a worksheet from its snapshot, fetching and saving a new snapshot when it is stale
+
+    @param wks The live worksheet
+    @param spreadsheet_id The key of the spreadsheet the worksheet belongs to
+    @param worksheet The index or title of the worksheet in the spreadsheet
+    @param max_age The maximum age in seconds of a reusable snapshot, `None` to always fetch
+    @param directory The directory the snapshots are kept in
+    @return A `SnapshotWorksheet` holding the worksheet values
+    """
+    path = snapshot_path(spreadsheet_id, worksheet, directory)
+
+    if max_age is not None and os.path.exists(path):
+        metadata, rows = load_snapshot(path)
+        if is_fresh(metadata, max_age, wks):
+            logger.info("Reusing snapshot of worksheet %s from %s" % (worksheet, path))
+            return SnapshotWorksheet(rows, title=metadata.get('title'))
+
+    # The header and values are read together, page by page so a transient error only retries one page
+    rows = paged_reader.PagedReader(wks, first_row=1).read()
+    save_snapshot(path, rows, {
+        'spreadsheet_id': spreadsheet_id,
+        'worksheet': worksheet,
+        'title': getattr(wks, 'title', None),
+        'updated': getattr(wks, 'updated', None),
+        'fetched_at': time.time(),
+    })
+
+    return SnapshotWorksheet(rows, title=getattr(wks, 'title', None))
+
+
+def offline_worksheet(spreadsheet_id, worksheet, directory=DEFAULT_SNAPSHOT_DIR):
+    """Replays a worksheet from its snapshot without touching the network
+
+    @param spreadsheet_id The key of the spreadsheet the worksheet belongs to
+    @param worksheet The index or title of the worksheet in the spreadsheet
+    @param directory The directory the snapshots are kept in
+    @return A `SnapshotWorksheet` holding the worksheet values
+    """
+    path = snapshot_path(spreadsheet_id, worksheet, directory)
+    if not os.path.exists(path):
+        raise Exception("No snapshot of worksheet {worksheet} of spreadsheet {id} in {directory}".format(
+            worksheet=worksheet, id=spreadsheet_id, directory=directory,
+        ))
+
+    metadata, rows = load_snapshot(path)
+    logger.info("Replaying worksheet %s from snapshot fetched at %s" % (
+        worksheet, time.ctime(metadata['fetched_at']),
+    ))
+
+    return SnapshotWorksheet(rows, title=metadata.get('title'))
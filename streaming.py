@@ -0,0 +1,183 @@
+import heapq
+import itertools
+import logging
+import os
+import pickle
+import tempfile
+
+import address_index
+import disk_writer
+import normalizers
+import paged_reader
+import records
+import report_generator
+import tract_rollups
+
+logger = logging.getLogger("das-care-contact-forms-logger")
+
+DEFAULT_PAGE_SIZE = paged_reader.DEFAULT_PAGE_SIZE
+DEFAULT_RUN_SIZE = 50000
+
+
+################
+# HELPER FUNCS #
+################
+
+def iter_chunks(items, chunk_size):
+    """Splits an iterable into lists of at most `chunk_size` items"""
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def _address_key(resp):
+    return address_index.canonical_address(report_generator.address_extractor(resp))
+
+
+def _sort_key(resp):
+    return (_address_key(resp), resp['Date of Contact'], resp['Timestamp'])
+
+
+def _spill_run(run, schemas):
+    """Sorts a run of responses and spills it to a temporary file
+
+    Only the values of each record are pickled, the shared schemas are kept in memory.
+
+    @param run The responses to spill
+    @param schemas List of the schemas of the spilled records, extended as new schemas are seen
+    @return The temporary file, rewound to the beginning
+    """
+    run_file = tempfile.TemporaryFile()
+    for resp in sorted(run, key=_sort_key):
+        if resp.schema not in schemas:
+            schemas.append(resp.schema)
+
+        pickle.dump((schemas.index(resp.schema), resp.values), run_file, pickle.HIGHEST_PROTOCOL)
+
+    run_file.seek(0)
+    return run_file
+
+
+def _read_run(run_file, schemas):
+    with run_file:
+        while True:
+            try:
+                schema_idx, values = pickle.load(run_file)
+            except EOFError:
+                return
+
+            yield records.ResponseRecord(schemas[schema_idx], values)
+
+
+###################
+# STREAMING FUNCS #
+###################
+
+def iter_worksheet_rows(responses_wks, page_size=DEFAULT_PAGE_SIZE):
+    """Reads the data rows of a worksheet in fixed-size row ranges
+
+    @param responses_wks The worksheet to load data from
+    @param page_size The number of rows fetched per request
+    @return Generator of raw rows, excluding the header row
+    """
+    return paged_reader.PagedReader(responses_wks, page_size).rows()
+
+
+def iter_responses(responses_wks, page_size=DEFAULT_PAGE_SIZE, forms_version=None):
+    """Streaming counterpart of `report_generator.format_responses`
+
+    @param responses_wks The worksheet to load data from
+    @param page_size The number of rows fetched per request
+    @param forms_version The name of the forms version of the worksheet, defaults to the config's
+    @return Generator of formatted responses
+    """
+    # Compile the migration plan once so every page shares it
+    plan = normalizers.compile_plan(responses_wks.row_values(1), forms_version)
+
+    for page in iter_chunks(iter_worksheet_rows(responses_wks, page_size), page_size):
+        for resp in report_generator.format_rows(plan, page):
+            yield resp
+
+
+def sort_by_address(responses, run_size=DEFAULT_RUN_SIZE):
+    """Sorts responses by address, date of contact and timestamp using an external merge sort
+
+    At most `run_size` responses are held in memory, the rest are spilled to temporary files.
+
+    @param responses Iterable of formatted response records
+    @param run_size The number of responses sorted in memory at once
+    @return Generator of the sorted responses
+    """
+    schemas = []
+    runs = [_spill_run(run, schemas) for run in iter_chunks(responses, run_size)]
+
+    return heapq.merge(*(_read_run(run_file, schemas) for run_file in runs), key=_sort_key)
+
+
+def stream_reports(
+    responses_worksheets,
+    page_size=DEFAULT_PAGE_SIZE,
+    run_size=DEFAULT_RUN_SIZE,
+    grouped_directory=os.path.abspath("./grouped_responses/"),
+    reports_directory=os.path.abspath("./reports/reports_by_address/"),
+    tract_summary_path=tract_rollups.DEFAULT_SUMMARY_PATH,
+    forms_versions=None,
+):
+    """Generates and writes the report and grouped responses of each address as soon as it is complete
+
+    @param responses_worksheets The worksheets to load data from, their responses are merged
+    @param page_size The number of rows fetched per request
+    @param run_size The number of responses sorted in memory at once
+    @param grouped_directory Where the grouped responses are written
+    @param reports_directory Where the reports are written
+    @param tract_summary_path Where the census tract totals are written
+    @param forms_versions The name of the forms version of each worksheet, defaults to the config's
+    @return The number of addresses processed
+    """
+    forms_versions = forms_versions or [None] * len(responses_worksheets)
+
+    # The manifests are shared by every address and only pruned once all addresses are seen
+    grouped_manifest = disk_writer.Manifest(grouped_directory)
+    reports_manifest = disk_writer.Manifest(reports_directory)
+    write_summaries = []
+    addresses = set()
+    rollup = tract_rollups.TractRollup()
+
+    sorted_resps = sort_by_address(
+        itertools.chain.from_iterable(
+            iter_responses(responses_wks, page_size, forms_version)
+            for responses_wks, forms_version in zip(responses_worksheets, forms_versions)
+        ),
+        run_size,
+    )
+    for address_key, resps in itertools.groupby(sorted_resps, key=_address_key):
+        grouped_resps = report_generator.group_responses_by_address(resps)
+        compressed_grouped_resps = report_generator.compress_grouped_responses(grouped_resps, rollup)
+
+        reports = report_generator.generate_reports(grouped_resps, compressed_grouped_resps)
+
+        write_summaries.append(report_generator.write_grouped_resps_to_disk(
+            grouped_resps, grouped_directory, manifest=grouped_manifest, prune=False,
+        ))
+        write_summaries.append(report_generator.write_reports_to_disk(
+            reports, compressed_grouped_resps, reports_directory, manifest=reports_manifest, prune=False,
+        ))
+
+        addresses.add(address_key)
+
+    num_removed = grouped_manifest.prune(addresses) + reports_manifest.prune(addresses)
+    grouped_manifest.save()
+    reports_manifest.save()
+
+    rollup.write_csv(tract_summary_path)
+
+    write_summary = disk_writer.merge_summaries(write_summaries)
+    logger.info("Streamed reports for %d addresses, files written: %d, skipped: %d, removed: %d" % (
+        len(addresses), write_summary.written, write_summary.skipped, write_summary.removed + num_removed,
+    ))
+
+    return len(addresses)
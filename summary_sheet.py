@@ -0,0 +1,163 @@
+import logging
+
+logger = logging.getLogger("das-care-contact-forms-logger")
+
+DEFAULT_SUMMARY_TITLE = "Report Summary"
+DEFAULT_BATCH_SIZE = 1000
+
+SUMMARY_HEADER = [
+    'Address',
+    'Census Tract',
+    'Initial Contact Date',
+    'C.A.R.E. Letter Date',
+    'Last Contact Date',
+    'Number of Contacts',
+    'Number of Phone Calls',
+    'Number of Mails',
+    'Number of Dogs',
+    'Number of Cats',
+    'Number of Fixed Animals',
+    'Number of Vaccinated Animals',
+    'Number of Registered Animals',
+    'Is In Compliance',
+]
+
+
+################
+# HELPER FUNCS #
+################
+
+def _column_letter(col_idx):
+    """Converts a 1-indexed column number to its A1 letters"""
+    letters = ''
+    while col_idx > 0:
+        col_idx, remainder = divmod(col_idx - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+
+    return letters
+
+
+def _pad(row, width):
+    return list(row[:width]) + [''] * (width - len(row))
+
+
+def _contiguous_ranges(row_indices):
+    """Splits sorted row indices into (first, last) runs of consecutive rows"""
+    ranges = []
+    for row_idx in row_indices:
+        if ranges and ranges[-1][1] == row_idx - 1:
+            ranges[-1][1] = row_idx
+        else:
+            ranges.append([row_idx, row_idx])
+
+    return ranges
+
+
+#######################
+# SUMMARY SHEET FUNCS #
+#######################
+
+def build_summary_rows(compressed_grouped_resps, history):
+    """Builds one summary row per address
+
+    @param compressed_grouped_resps Dictionary mapping address to its compressed response
+    @param history The `contact_history.ContactHistory` of the responses
+    @return List of rows in `SUMMARY_HEADER` order, sorted by address
+    """
+    format_date = lambda date: date.strftime("%m/%d/%y") if date else ''
+
+    rows = []
+    for address in sorted(compressed_grouped_resps):
+        compressed = compressed_grouped_resps[address]
+        counts = history.counts(address)
+        initial_contact_dates = history.dates(address, 'Initial Contact')
+        care_letter_dates = history.dates(address, 'C.A.R.E. Letter')
+
+        rows.append([
+            address,
+            compressed.get('Census Tract', ''),
+            format_date(initial_contact_dates[0] if initial_contact_dates else None),
+            format_date(care_letter_dates[0] if care_letter_dates else None),
+            format_date(history.last_contact(address)),
+            str(history.num_contacts(address)),
+            str(counts.get('Phone Call', 0)),
+            str(counts.get('Mail/Email', 0)),
+            compressed.get('How many dogs do they have?', ''),
+            compressed.get('How many cats do they have?', ''),
+            compressed.get('Spayed/Neutered?', ''),
+            compressed.get('Vaccinated?', ''),
+            compressed.get('Registered?', ''),
+            compressed.get('Compliance?', ''),
+        ])
+
+    return rows
+
+
+def open_summary_worksheet(spreadsheet, title=DEFAULT_SUMMARY_TITLE, num_rows=1000):
+    """Opens the summary worksheet of a spreadsheet, adding it if it does not exist yet"""
+    for wks in spreadsheet.worksheets():
+        if wks.title == title:
+            return wks
+
+    return spreadsheet.add_worksheet(title, num_rows, len(SUMMARY_HEADER))
+
+
+def write_summary(summary_wks, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Writes the summary rows to a worksheet, only sending the rows that changed
+
+    The current contents are read in a single request and every changed range is sent in a single
+    batched update per `batch_size` rows, instead of one request per cell.
+
+    @param summary_wks The summary worksheet
+    @param rows The summary rows, without the header row
+    @param batch_size The maximum number of rows sent per batched update
+    @return The number of rows updated
+    """
+    width = len(SUMMARY_HEADER)
+    desired_rows = [list(SUMMARY_HEADER)] + [_pad(row, width) for row in rows]
+    existing_rows = [_pad(row, width) for row in summary_wks.get_all_values()]
+
+    # Rows left over from a previous, longer summary are cleared
+    blank_row = [''] * width
+    desired_rows.extend(blank_row for _ in range(len(existing_rows) - len(desired_rows)))
+
+    changed_row_indices = [
+        row_idx
+        for row_idx, row in enumerate(desired_rows)
+        if row_idx >= len(existing_rows) or existing_rows[row_idx] != row
+    ]
+    if not changed_row_indices:
+        return 0
+
+    missing_rows = len(desired_rows) - getattr(summary_wks, 'row_count', len(existing_rows))
+    if missing_rows > 0:
+        summary_wks.add_rows(missing_rows)
+
+    # Split the changed ranges so no batch exceeds `batch_size` rows
+    updates = []
+    for first_idx, last_idx in _contiguous_ranges(changed_row_indices):
+        for chunk_first_idx in range(first_idx, last_idx + 1, batch_size):
+            chunk_last_idx = min(chunk_first_idx + batch_size - 1, last_idx)
+            updates.append({
+                'range': "A{first}:{col}{last}".format(
+                    first=chunk_first_idx + 1, col=_column_letter(width), last=chunk_last_idx + 1,
+                ),
+                'values': desired_rows[chunk_first_idx:chunk_last_idx + 1],
+            })
+
+    batch = []
+    batch_rows = 0
+    for update in updates:
+        if batch and batch_rows + len(update['values']) > batch_size:
+            summary_wks.batch_update(batch)
+            batch = []
+            batch_rows = 0
+
+        batch.append(update)
+        batch_rows += len(update['values'])
+
+    summary_wks.batch_update(batch)
+
+    logger.info("Updated %d rows of the summary worksheet" % len(changed_row_indices))
+
+    return len(changed_row_indices)
@@ -3,3 +3,14 @@ import os
 
 # Append the root directory to the system path
 sys.path.append(os.path.abspath(os.path.dirname(__file__) + "/../"))
+
+import service
+
+# Run the tests against an in-memory config and spreadsheet backend
+service.configure(
+    config={
+        'forms_version': 'V1',
+        'main_spreadsheet': {'id': 'test-spreadsheet', 'name': 'Test Spreadsheet'},
+    },
+    backend=lambda: service.LocalClient([]),
+)
@@ -0,0 +1,71 @@
+import address_index
+import incremental_sync
+import metrics
+import report_generator
+
+from test_report_generator import MockWorksheet
+
+
+def test_normalize_address():
+    assert address_index.normalize_address("123 Main St") == "123 main st"
+    assert address_index.normalize_address("  123  main   Street. ") == "123 main st"
+    assert address_index.normalize_address("4500 N. O'Connor Road, #12-B") == "4500 n oconnor rd 12 b"
+    assert address_index.normalize_address("...") == ""
+
+
+def test_index_memoizes_and_interns_keys():
+    index = address_index.AddressIndex()
+
+    key = index.key("123 Main Street")
+    assert index.key("123 main st.") is key
+    assert index.key("123 Main Street") is key
+    assert index.slug("123 MAIN ST") == "123_main_st"
+
+
+def test_spellings_of_an_address_are_grouped_together(tmpdir):
+    mock_wks = MockWorksheet([
+        ['Street Address',   'Timestamp',          'Type of Contact', 'Census Tract'],
+        ['123 main street.', '12/1/2017 06:03:22', 'C.A.R.E. Letter', '44.5'],
+        ['123 Main St',      '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+        ['456 Elm Ave',      '10/4/2016 11:47:55', 'Phone Call',      '55.6'],
+    ])
+
+    grouped_resps = report_generator.group_responses_by_address(report_generator.format_responses(mock_wks))
+
+    # The address is displayed as spelled in its earliest response
+    assert list(grouped_resps) == ['123 Main St', '456 Elm Ave']
+    assert len(grouped_resps['123 Main St']) == 2
+
+    compressed_resps = report_generator.compress_grouped_responses(grouped_resps)
+    reports = report_generator.generate_reports(grouped_resps, compressed_resps)
+    report_generator.write_reports_to_disk(reports, compressed_resps, str(tmpdir))
+
+    assert tmpdir.join("ct_445", "123_main_st.txt").check()
+    assert tmpdir.join("ct_556", "456_elm_ave.txt").check()
+
+
+def test_addresses_without_words_are_dropped_and_counted(tmpdir):
+    def make_wks():
+        return MockWorksheet([
+            ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract'],
+            ['123 Main St',    '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+            ['.',              '10/4/2016 11:47:55', 'Phone Call',      '55.6'],
+            ['#',              '12/1/2017 06:03:22', 'Phone Call',      '55.6'],
+        ])
+
+    run_metrics = metrics.reset()
+    formatted_resps = report_generator.format_responses(make_wks())
+
+    assert [resp['Street Address'] for resp in formatted_resps] == ['123 Main St']
+    assert run_metrics.counters['dropped_rows'] == 2
+
+    run_metrics = metrics.reset()
+    touched_addresses = incremental_sync.sync(
+        make_wks(), str(tmpdir.join("state.json")),
+        grouped_directory=str(tmpdir.join("grouped")),
+        reports_directory=str(tmpdir.join("reports")),
+        tract_summary_path=str(tmpdir.join("tract_summary.csv")),
+    )
+
+    assert touched_addresses == {'123 Main St'}
+    assert run_metrics.counters['dropped_rows'] == 2
@@ -0,0 +1,75 @@
+import csv
+import gzip
+import json
+
+import bulk_export
+import report_generator
+
+from test_report_generator import MockWorksheet
+
+
+def make_responses():
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'How many dogs do they have?', 'Census Tract'],
+        ['address two',    '10/4/2016 11:47:55', 'Phone Call',      '',                            '55.6'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '4',                           '44.5'],
+        ['address one',    '12/1/2017 06:03:22', 'C.A.R.E. Letter', '3',                           '44.5'],
+    ])
+
+    grouped_resps = report_generator.group_responses_by_address(report_generator.format_responses(mock_wks))
+    return grouped_resps, report_generator.compress_grouped_responses(grouped_resps)
+
+
+def test_export_jsonl_and_csv(tmpdir):
+    grouped_resps, compressed_resps = make_responses()
+    jsonl_path = str(tmpdir.join("export", "responses.jsonl.gz"))
+    csv_path = str(tmpdir.join("export", "responses.csv"))
+
+    assert bulk_export.export_responses(grouped_resps, compressed_resps, jsonl_path, csv_path) == 5
+
+    with gzip.open(jsonl_path, 'rt') as jsonl_file:
+        records = [json.loads(line) for line in jsonl_file]
+
+    assert [(record['record_type'], record['address']) for record in records] == [
+        ('response', 'address one'),
+        ('response', 'address one'),
+        ('compressed', 'address one'),
+        ('response', 'address two'),
+        ('compressed', 'address two'),
+    ]
+    assert records[1]['Timestamp'] == '2017-12-01T06:03:22'
+    assert records[2]['How many dogs do they have?'] == '3'
+    assert 'How many dogs do they have?' not in records[3]
+
+    with open(csv_path, newline='') as csv_file:
+        rows = list(csv.reader(csv_file))
+
+    assert rows[0] == [
+        'record_type', 'address',
+        'Census Tract', 'Date of Contact', 'How many dogs do they have?', 'Street Address', 'Timestamp',
+        'Type of Contact',
+    ]
+    assert rows[4] == [
+        'response', 'address two', '55.6', '2016-10-04T11:47:55', '', 'address two', '2016-10-04T11:47:55',
+        'Phone Call',
+    ]
+    assert len(rows) == 6
+
+    # No temporary files are left behind
+    assert sorted(path.basename for path in tmpdir.join("export").listdir()) == [
+        'responses.csv', 'responses.jsonl.gz',
+    ]
+
+
+def test_failed_export_leaves_no_file(tmpdir):
+    grouped_resps, compressed_resps = make_responses()
+    csv_path = str(tmpdir.join("responses.csv"))
+
+    try:
+        with bulk_export.BulkExporter(['Street Address'], csv_path=csv_path) as exporter:
+            exporter.write_address('address one', grouped_resps['address one'], compressed_resps['address one'])
+            raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        pass
+
+    assert tmpdir.listdir() == []
@@ -0,0 +1,52 @@
+import threading
+
+import concurrent_fetch
+import service
+
+
+def test_fetch_all_runs_concurrently_and_keeps_source_order():
+    sources = [('spreadsheet_one', 0), ('spreadsheet_one', 'District 2'), ('spreadsheet_two', 0)]
+    in_flight = []
+    max_in_flight = []
+    lock = threading.Lock()
+    # Fetches block until two are in flight together, which only happens if they run concurrently
+    overlapped = threading.Event()
+
+    def fetch(spreadsheet_id, worksheet):
+        with lock:
+            in_flight.append(1)
+            max_in_flight.append(len(in_flight))
+            if len(in_flight) == 2:
+                overlapped.set()
+
+        overlapped.wait(timeout=10)
+
+        with lock:
+            in_flight.pop()
+
+        return (spreadsheet_id, worksheet)
+
+    worksheets = concurrent_fetch.fetch_all(sources, fetch, max_in_flight=2)
+
+    assert worksheets == sources
+    assert max(max_in_flight) == 2
+
+
+def test_worksheet_sources_from_config():
+    config = service.get_config()
+    try:
+        service.configure(config={
+            'forms_version': 'V1',
+            'spreadsheets': [
+                {'id': 'spreadsheet_one', 'name': '2016', 'worksheets': [0, 'District 2']},
+                {'id': 'spreadsheet_two', 'name': '2017'},
+            ],
+        })
+
+        assert service.get_worksheet_sources() == [
+            ('spreadsheet_one', 0), ('spreadsheet_one', 'District 2'), ('spreadsheet_two', 0),
+        ]
+    finally:
+        service.configure(config=config)
+
+    assert service.get_worksheet_sources() == [('test-spreadsheet', 0)]
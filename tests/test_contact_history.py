@@ -0,0 +1,31 @@
+import datetime
+
+import contact_history
+import report_generator
+
+from test_report_generator import MockWorksheet
+
+
+def test_history_is_built_while_grouping():
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact'],
+        ['address_one',    '12/1/2017 06:03:22', 'Phone Call'],
+        ['address_two',    '10/4/2016 11:47:55', 'Initial Contact'],
+        ['address_one',    '10/4/2016 15:09:24', 'Phone Call'],
+        ['address_one',    '11/4/2016 15:09:24', 'Mail/Email'],
+    ])
+
+    history = contact_history.ContactHistory()
+    report_generator.group_responses_by_address(report_generator.format_responses(mock_wks), history)
+
+    assert history.dates('address_one', 'Phone Call') == [
+        datetime.datetime(2016, 10, 4, 15, 9, 24),
+        datetime.datetime(2017, 12, 1, 6, 3, 22),
+    ]
+    assert history.counts('address_one') == {'Phone Call': 2, 'Mail/Email': 1}
+    assert history.num_contacts('address_one') == 3
+    assert history.first_contact('address_one') == datetime.datetime(2016, 10, 4, 15, 9, 24)
+    assert history.last_contact('address_one') == datetime.datetime(2017, 12, 1, 6, 3, 22)
+
+    assert history.stale_addresses(30, as_of=datetime.datetime(2017, 12, 15)) == ['address_two']
+    assert history.stale_addresses(30, as_of=datetime.datetime(2018, 6, 1)) == ['address_two', 'address_one']
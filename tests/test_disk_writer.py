@@ -0,0 +1,80 @@
+import os
+
+import disk_writer
+
+
+def test_write_files_creates_directories_and_leaves_no_temp_files(tmpdir):
+    files = dict(
+        (str(tmpdir.join("ct_{0}".format(idx % 3), "{0}.txt".format(idx))), "report {0}".format(idx))
+        for idx in range(20)
+    )
+
+    disk_writer.write_files(files, max_workers=4)
+
+    for file_path, content in files.items():
+        with open(file_path) as f:
+            assert f.read() == content
+
+    assert sorted(
+        file_name
+        for _, _, file_names in os.walk(str(tmpdir))
+        for file_name in file_names
+    ) == sorted(os.path.basename(file_path) for file_path in files)
+
+
+def test_manifest_skips_unchanged_files_and_removes_stale_ones(tmpdir):
+    directory = str(tmpdir)
+
+    manifest = disk_writer.Manifest(directory)
+    summary = manifest.write({
+        'address one': ('ct_1/address_one.txt', 'one'),
+        'address two': ('ct_1/address_two.txt', 'two'),
+        'address three': ('ct_3/address_three.txt', 'three'),
+    })
+    manifest.save()
+    assert summary == disk_writer.WriteSummary(written=3, skipped=0, removed=0, bytes_written=11)
+
+    # `address two` changed and `address three` moved census tract
+    manifest = disk_writer.Manifest(directory)
+    summary = manifest.write({
+        'address one': ('ct_1/address_one.txt', 'one'),
+        'address two': ('ct_1/address_two.txt', 'two!'),
+        'address three': ('ct_2/address_three.txt', 'three'),
+    })
+    assert summary == disk_writer.WriteSummary(written=2, skipped=1, removed=1, bytes_written=9)
+    assert not os.path.exists(os.path.join(directory, 'ct_3'))
+
+    assert manifest.prune(['address one', 'address three']) == 1
+    assert not os.path.exists(os.path.join(directory, 'ct_1', 'address_two.txt'))
+
+
+def test_manifest_prune_keeps_files_shared_with_kept_keys(tmpdir):
+    directory = str(tmpdir)
+
+    # Entries saved under an old spelling of the key, then rewritten under the new one
+    manifest = disk_writer.Manifest(directory)
+    manifest.write({'Address One': ('address_one.txt', 'one')})
+    manifest.write({'address one': ('address_one.txt', 'one')})
+
+    assert manifest.prune(['address one']) == 0
+    assert os.path.exists(os.path.join(directory, 'address_one.txt'))
+    assert list(manifest.entries) == ['address one']
+
+
+def test_manifest_defers_removal_of_moved_files(tmpdir):
+    directory = str(tmpdir)
+
+    manifest = disk_writer.Manifest(directory)
+    manifest.write({'address one': ('ct_1/address_one.txt', 'one')})
+    manifest.save()
+
+    worker_manifest = disk_writer.Manifest(directory, defer_removals=True)
+    summary = worker_manifest.write({'address one': ('ct_2/address_one.txt', 'one')})
+    assert summary.removed == 0
+    assert worker_manifest.deferred_removals == ['ct_1/address_one.txt']
+    assert os.path.exists(os.path.join(directory, 'ct_1', 'address_one.txt'))
+
+    manifest.entries.update(worker_manifest.entries)
+    assert manifest.remove_deferred(worker_manifest.deferred_removals) == 1
+    assert not os.path.exists(os.path.join(directory, 'ct_1'))
+    assert os.path.exists(os.path.join(directory, 'ct_2', 'address_one.txt'))
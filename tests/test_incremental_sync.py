@@ -0,0 +1,94 @@
+import os
+
+import incremental_sync
+
+from test_report_generator import MockWorksheet
+
+
+def append_row(mock_wks, row):
+    # Mirror the `Date of Contact` column the mock worksheet copies from `Timestamp`
+    mock_wks._data.append(row + [row[mock_wks._data[0].index('Timestamp')]])
+
+
+def test_sync_only_regenerates_touched_addresses(tmpdir):
+    state_path = str(tmpdir.join("state.json"))
+    directories = dict(
+        grouped_directory=str(tmpdir.join("grouped")),
+        reports_directory=str(tmpdir.join("reports")),
+        tract_summary_path=str(tmpdir.join("tract_summary.csv")),
+    )
+
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+        ['address two',    '10/4/2016 11:47:55', 'Phone Call',      '55.6'],
+    ])
+
+    assert incremental_sync.sync(mock_wks, state_path, **directories) == {'address one', 'address two'}
+    assert incremental_sync.sync(mock_wks, state_path, **directories) == set()
+
+    append_row(mock_wks, ['address one', '12/1/2017 06:03:22', 'C.A.R.E. Letter', '44.5'])
+
+    assert incremental_sync.sync(mock_wks, state_path, **directories) == {'address one'}
+
+    with open(os.path.join(directories['reports_directory'], 'ct_445', 'address_one.txt')) as report_file:
+        report = report_file.read()
+
+    assert 'C.A.R.E. Letter Date: 12/01/17' in report
+    assert 'Phone Call Dates: [10/04/16]' in report
+
+
+def test_sync_rebuilds_when_rows_above_watermark_change(tmpdir):
+    state_path = str(tmpdir.join("state.json"))
+    directories = dict(
+        grouped_directory=str(tmpdir.join("grouped")),
+        reports_directory=str(tmpdir.join("reports")),
+        tract_summary_path=str(tmpdir.join("tract_summary.csv")),
+    )
+
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+        ['address two',    '10/4/2016 11:47:55', 'Phone Call',      '55.6'],
+    ])
+
+    incremental_sync.sync(mock_wks, state_path, **directories)
+
+    # Remove the watermark row
+    mock_wks._data.pop()
+
+    assert incremental_sync.sync(mock_wks, state_path, **directories) == {'address one'}
+
+
+def test_edits_above_watermark_wait_for_a_full_rebuild(tmpdir):
+    state_path = str(tmpdir.join("state.json"))
+    directories = dict(
+        grouped_directory=str(tmpdir.join("grouped")),
+        reports_directory=str(tmpdir.join("reports")),
+        tract_summary_path=str(tmpdir.join("tract_summary.csv")),
+    )
+
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+        ['address two',    '10/4/2016 11:47:55', 'Phone Call',      '55.6'],
+    ])
+    incremental_sync.sync(mock_wks, state_path, **directories)
+
+    # A coordinator corrects the census tract of an older response
+    mock_wks._data[1][3] = '55.6'
+
+    assert incremental_sync.sync(mock_wks, state_path, **directories) == set()
+    assert incremental_sync.sync(mock_wks, state_path, full_rebuild=True, **directories) == {
+        'address one', 'address two',
+    }
+    assert sorted(os.listdir(directories['reports_directory'])) == ['.manifest.json', 'ct_556']
+    assert sorted(os.listdir(os.path.join(directories['reports_directory'], 'ct_556'))) == [
+        'address_one.txt', 'address_two.txt',
+    ]
+
+    # Without new rows, syncs past the rebuild interval rebuild every report too
+    assert incremental_sync.sync(mock_wks, state_path, **directories) == set()
+    assert incremental_sync.sync(mock_wks, state_path, rebuild_interval=0, **directories) == {
+        'address one', 'address two',
+    }
@@ -0,0 +1,58 @@
+import tracemalloc
+
+import metrics
+import report_generator
+
+from test_report_generator import MockWorksheet
+
+
+def test_stage_counters():
+    run_metrics = metrics.reset()
+
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'c'],
+        ['address_one',    '10/4/2016 15:09:24', '1'],
+        ['',               '10/4/2016 11:47:55', '2'],
+        ['address_two',    '12/1/2017 06:03:22', '3'],
+    ])
+
+    with metrics.stage('format_responses'):
+        formatted_resps = report_generator.format_responses(mock_wks)
+    with metrics.stage('group_responses_by_address'):
+        report_generator.group_responses_by_address(formatted_resps)
+
+    summary = run_metrics.summary()
+    assert summary['counters'] == {'pages_fetched': 1, 'rows': 3, 'dropped_rows': 1, 'addresses': 2}
+    assert summary['stages']['format_responses']['counters'] == {'pages_fetched': 1, 'rows': 3, 'dropped_rows': 1}
+    assert summary['stages']['format_responses']['calls'] == 1
+    assert summary['stages']['group_responses_by_address']['seconds'] >= 0
+
+    worker_metrics = metrics.Metrics()
+    with worker_metrics.stage('format_responses'):
+        worker_metrics.count('rows', 2)
+
+    run_metrics.merge(worker_metrics.summary())
+    assert summary['counters']['rows'] == 5
+    assert summary['stages']['format_responses']['calls'] == 2
+
+
+def test_nested_stage_keeps_enclosing_peak():
+    run_metrics = metrics.Metrics()
+
+    tracemalloc.start()
+    try:
+        with run_metrics.stage('outer'):
+            large = bytearray(4 * 1024 * 1024)
+            del large
+            with run_metrics.stage('inner'):
+                small = bytearray(1024)
+                del small
+    finally:
+        tracemalloc.stop()
+
+    assert run_metrics.stages['outer']['peak_traced_bytes'] >= 4 * 1024 * 1024
+    assert run_metrics.stages['inner']['peak_traced_bytes'] < 4 * 1024 * 1024
+
+    if metrics.resource is not None:
+        for stage_metrics in run_metrics.stages.values():
+            assert stage_metrics['rss_growth_bytes'] <= stage_metrics['process_peak_rss_bytes']
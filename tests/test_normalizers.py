@@ -0,0 +1,99 @@
+import datetime
+
+import pytest
+
+import normalizers
+import report_generator
+import service
+
+
+def test_plan_renames_old_columns_in_the_schema():
+    plan = normalizers.compile_plan(['Street Address', 'Timestamp', 'Date of Contact', 'Registered Animals'])
+
+    assert plan.conflicting_renames == []
+    assert normalizers.compile_plan(
+        ['Street Address', 'Timestamp', 'Date of Contact', 'Registered Animals']
+    ) is plan
+
+    resp, = plan.records_from_rows([['address one', '10/4/2016 15:09:24', '10/4/2016', '2']])
+
+    assert dict(resp) == {
+        'Street Address': 'address one',
+        'Timestamp': datetime.datetime(2016, 10, 4, 15, 9, 24),
+        'Date of Contact': datetime.datetime(2016, 10, 4),
+        'Registered?': '2',
+    }
+    assert plan.address(resp) == 'address one'
+    assert plan.raw_address(['', '10/4/2016 15:09:24']) is None
+
+
+def test_plan_checks_conflicting_columns():
+    plan = normalizers.compile_plan(
+        ['Street Address', 'Timestamp', 'Date of Contact', 'Vaccinated Animals', 'Vaccinated?']
+    )
+
+    with pytest.raises(Exception, match="cannot both be present"):
+        plan.records_from_rows([['address one', '10/4/2016', '10/4/2016', '1', '2']])
+
+
+def test_plan_requires_converted_fields():
+    plan = normalizers.compile_plan(['Street Address', 'Timestamp', 'Date of Contact'])
+
+    with pytest.raises(KeyError):
+        plan.records_from_rows([['address one', '', '10/4/2016']])
+
+
+def test_unknown_forms_version():
+    with pytest.raises(ValueError):
+        normalizers.compile_plan(['Street Address'], 'V0')
+
+
+def test_mixed_forms_versions(monkeypatch):
+    monkeypatch.setitem(normalizers._registry, 'V2', normalizers.FormsVersion(
+        'V2',
+        address_field='Address',
+        renamed_fields={'Contact Type': 'Type of Contact'},
+        converted_fields={
+            'Timestamp': report_generator.convert_timestamps,
+            'Date of Contact': report_generator.convert_timestamps,
+        },
+        report_template=[["V2 report for {address}"]],
+    ))
+
+    v1_resps = report_generator.format_rows(
+        ['Street Address', 'Timestamp', 'Date of Contact', 'Type of Contact', 'Census Tract'],
+        [['address one', '10/4/2016', '10/4/2016', 'Phone Call', '44.5']],
+    )
+    v2_resps = report_generator.format_rows(
+        ['Address', 'Timestamp', 'Date of Contact', 'Contact Type', 'Census Tract'],
+        [['address two', '10/5/2016', '10/5/2016', 'Mail/Email', '55.6']],
+        forms_version='V2',
+    )
+
+    grouped_resps = report_generator.group_responses_by_address(v1_resps + v2_resps)
+    assert list(grouped_resps) == ['address one', 'address two']
+    assert grouped_resps['address two'][0]['Type of Contact'] == 'Mail/Email'
+
+    compressed_resps = report_generator.compress_grouped_responses(grouped_resps)
+    reports = report_generator.generate_reports(grouped_resps, compressed_resps)
+
+    assert reports['address one'].startswith('Address: address one')
+    assert reports['address two'] == 'V2 report for address two'
+
+
+def test_forms_version_per_spreadsheet():
+    config = service.get_config()
+    try:
+        service.configure(config={
+            'forms_version': 'V1',
+            'spreadsheets': [
+                {'id': 'spreadsheet_one', 'name': '2016'},
+                {'id': 'spreadsheet_two', 'name': '2017', 'forms_version': 'V2'},
+            ],
+        })
+
+        assert service.get_forms_version('spreadsheet_one') == 'V1'
+        assert service.get_forms_version('spreadsheet_two') == 'V2'
+        assert service.get_forms_version() == 'V1'
+    finally:
+        service.configure(config=config)
@@ -0,0 +1,187 @@
+import collections
+import time
+
+import pytest
+
+import paged_reader
+import report_generator
+import service
+
+
+Response = collections.namedtuple('Response', ['status_code'])
+
+
+class APIError(Exception):
+    def __init__(self, status_code):
+        super().__init__("HTTP {0}".format(status_code))
+        self.response = Response(status_code)
+
+
+class FlakyWorksheet(service.LocalWorksheet):
+    """Local worksheet whose ranged reads fail or lag as scripted"""
+
+    def __init__(self, rows, failures=None, latency=0):
+        """
+        @param rows The worksheet values, header row first
+        @param failures Dictionary mapping a range to the list of errors its next reads raise
+        @param latency Seconds every ranged read takes
+        """
+        super().__init__(rows)
+        self.failures = failures or {}
+        self.latency = latency
+        self.requested_ranges = []
+
+    def get_values(self, range_name):
+        self.requested_ranges.append(range_name)
+        time.sleep(self.latency)
+
+        if self.failures.get(range_name):
+            raise self.failures[range_name].pop(0)
+
+        return super().get_values(range_name)
+
+
+class StaleWorksheet(service.LocalWorksheet):
+    """Local worksheet whose `row_count` stays at the size it was opened with, like gspread's cached grid"""
+
+    def __init__(self, rows):
+        super().__init__(rows)
+        self._opened_row_count = len(rows)
+
+    @property
+    def row_count(self):
+        return self._opened_row_count
+
+
+class TrimmingWorksheet(StaleWorksheet):
+    """Stale worksheet whose ranged reads drop trailing empty rows and whose grid size is fetched
+    from the metadata of its spreadsheet, like gspread's"""
+
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.id = 0
+        self.spreadsheet = self
+
+    def fetch_sheet_metadata(self):
+        return {'sheets': [{'properties': {'sheetId': self.id, 'gridProperties': {'rowCount': len(self._rows)}}}]}
+
+    def get_values(self, range_name):
+        rows = super().get_values(range_name)
+        while rows and not any(rows[-1]):
+            rows = rows[:-1]
+
+        return rows
+
+
+def make_rows(num_rows):
+    return [['Street Address', 'Timestamp', 'Date of Contact']] + [
+        ['address {0}'.format(row_idx % 3), '10/4/2016 15:09:24', '10/4/2016 15:09:24']
+        for row_idx in range(num_rows)
+    ]
+
+
+def test_reader_retries_transient_errors():
+    rows = make_rows(7)
+    sleeps = []
+    wks = FlakyWorksheet(rows, failures={
+        '2:4': [APIError(429), APIError(503)],
+        '5:7': [ConnectionError("connection reset")],
+    })
+
+    reader = paged_reader.PagedReader(wks, page_size=3, sleep=sleeps.append)
+
+    assert reader.read() == rows[1:]
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= paged_reader.DEFAULT_MAX_DELAY for delay in sleeps)
+
+
+def test_reader_does_not_retry_client_errors():
+    wks = FlakyWorksheet(make_rows(4), failures={'2:4': [APIError(400)]})
+    reader = paged_reader.PagedReader(wks, page_size=3, sleep=lambda delay: None)
+
+    with pytest.raises(APIError):
+        reader.read()
+
+    assert wks.requested_ranges == ['2:4']
+
+
+def test_reader_resumes_from_last_good_page():
+    rows = make_rows(7)
+    wks = FlakyWorksheet(rows, failures={'5:7': [APIError(500)] * 3})
+    reader = paged_reader.PagedReader(wks, page_size=3, max_retries=2, sleep=lambda delay: None)
+
+    read_rows = []
+    with pytest.raises(APIError):
+        for row in reader.rows():
+            read_rows.append(row)
+
+    assert read_rows == rows[1:4]
+    assert reader.next_row == 5
+
+    # The page that failed is fetched again, the pages before it are not
+    read_rows.extend(reader.rows())
+
+    assert read_rows == rows[1:]
+    assert wks.requested_ranges.count('2:4') == 1
+
+
+def test_reader_prefetches_next_page():
+    wks = FlakyWorksheet(make_rows(6), latency=0.01)
+    pages = paged_reader.PagedReader(wks, page_size=3).pages()
+
+    next(pages)
+
+    # The second page is requested while the first one is still being processed
+    deadline = time.time() + 5
+    while len(wks.requested_ranges) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert wks.requested_ranges == ['2:4', '5:7']
+
+
+def test_format_responses_reads_pages():
+    rows = make_rows(10)
+    wks = FlakyWorksheet(rows)
+
+    formatted_resps = report_generator.format_responses(wks, page_size=4)
+
+    assert [resp['Street Address'] for resp in formatted_resps] == [row[0] for row in rows[1:]]
+    assert wks.requested_ranges == ['2:5', '6:9', '10:13']
+
+
+def test_reader_reads_rows_appended_after_the_worksheet_was_opened():
+    rows = make_rows(4)
+    wks = StaleWorksheet(rows)
+    rows.extend(make_rows(6)[1:])
+
+    assert paged_reader.PagedReader(wks, page_size=3).read() == rows[1:]
+    assert paged_reader.PagedReader(wks, page_size=3, first_row=6).read() == rows[5:]
+
+
+def test_reader_stops_at_first_short_page():
+    wks = FlakyWorksheet(make_rows(5))
+
+    assert len(paged_reader.PagedReader(wks, page_size=3).read()) == 5
+    assert wks.requested_ranges == ['2:4', '5:7']
+
+
+def test_reader_stops_at_range_past_the_grid():
+    rows = make_rows(6)
+    wks = FlakyWorksheet(rows, failures={'8:10': [APIError(400)]})
+
+    assert paged_reader.PagedReader(wks, page_size=3, sleep=lambda delay: None).read() == rows[1:]
+    assert wks.requested_ranges == ['2:4', '5:7', '8:10']
+
+
+def test_reader_reads_past_cleared_rows():
+    rows = make_rows(9)
+    rows[2] = rows[3] = ['', '', '']
+    rows[8] = rows[9] = ['', '', '']
+    wks = TrimmingWorksheet(rows)
+    rows.extend(make_rows(3)[1:])
+
+    # Cleared rows inside the sheet keep their place, the ones at its end are dropped
+    assert paged_reader.PagedReader(wks, page_size=3).read() == rows[1:2] + [[], []] + rows[4:8] + [[], []] + rows[10:]
+
+    rows[10:] = [['', '', '']] * 3
+    assert paged_reader.PagedReader(wks, page_size=3).read() == rows[1:2] + [[], []] + rows[4:8]
@@ -0,0 +1,27 @@
+import records
+
+
+def test_record_behaves_like_a_dict():
+    schema = records.ResponseSchema(['a', 'b', 'c'])
+    record = schema.record_from_row(['1', '', '3'])
+
+    assert record == {'a': '1', 'c': '3'}
+    assert record.get('b') is None
+    assert 'b' not in record
+
+    # Fields missing from the header extend the shared schema
+    record['d'] = '4'
+    del record['a']
+    assert record == {'c': '3', 'd': '4'}
+    assert schema.record_from_row(['5']) == {'a': '5'}
+
+
+def test_compress_records_last_non_empty_value_wins():
+    schema = records.ResponseSchema(['a', 'b', 'c'])
+
+    compressed = records.compress_records([
+        schema.record_from_row(['1', '2', '']),
+        schema.record_from_row(['',  '4', '5']),
+    ])
+
+    assert compressed == {'a': '1', 'b': '4', 'c': '5'}
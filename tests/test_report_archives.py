@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+import report_archives
+import report_generator
+
+from test_report_generator import MockWorksheet
+
+
+def make_reports():
+    mock_wks = MockWorksheet([
+        ['Street Address',   'Timestamp',          'Type of Contact', 'How many dogs do they have?', 'Census Tract'],
+        ['12 Oak Avenue',    '10/4/2016 11:47:55', 'Phone Call',      '',                            '55.6'],
+        ['123 Main Street.', '10/4/2016 15:09:24', 'Phone Call',      '4',                           '44.5'],
+        ['99 Elm St',        '12/1/2017 06:03:22', 'C.A.R.E. Letter', '3',                           '44.5'],
+    ])
+
+    grouped_resps = report_generator.group_responses_by_address(report_generator.format_responses(mock_wks))
+    compressed_resps = report_generator.compress_grouped_responses(grouped_resps)
+    reports = report_generator.generate_reports(grouped_resps, compressed_resps)
+    return reports, compressed_resps
+
+
+def test_pack_and_read_archive(tmpdir):
+    reports, _ = make_reports()
+    archive_path = str(tmpdir.join("ct_445.pack"))
+    with open(archive_path, 'wb') as archive_file:
+        archive_file.write(report_archives.pack_reports(reports))
+
+    with report_archives.ReportArchive(archive_path) as archive:
+        assert archive.addresses() == sorted(reports)
+        assert archive.get('123 main st') == reports['123 Main Street.']
+        assert archive.get('12 OAK AVE.') == reports['12 Oak Avenue']
+        assert 'nowhere' not in archive
+        assert archive.get('nowhere') is None
+
+
+def test_invalid_archive(tmpdir):
+    archive_path = tmpdir.join("ct_445.pack")
+    archive_path.write_binary(b"not an archive, just some text that is long enough")
+
+    with pytest.raises(ValueError):
+        report_archives.ReportArchive(str(archive_path))
+
+
+def test_write_and_find_reports(tmpdir):
+    reports, compressed_resps = make_reports()
+    directory = str(tmpdir.join("archives"))
+
+    summary = report_archives.write_report_archives(reports, compressed_resps, directory)
+    assert (summary.written, summary.skipped, summary.removed) == (2, 0, 0)
+    assert [os.path.basename(path) for path in report_archives.archive_paths(directory)] == [
+        'ct_445.pack', 'ct_556.pack',
+    ]
+
+    assert report_archives.find_report(directory, '99 elm street') == reports['99 Elm St']
+    assert report_archives.find_report(directory, '99 elm street', '44.5') == reports['99 Elm St']
+    assert report_archives.find_report(directory, '99 elm street', '55.6') is None
+    assert report_archives.find_report(directory, '99 elm street', '1.0') is None
+
+    # Unchanged archives are skipped and archives of census tracts without reports are removed
+    del reports['12 Oak Avenue']
+    summary = report_archives.write_report_archives(reports, compressed_resps, directory)
+    assert (summary.written, summary.skipped, summary.removed) == (0, 1, 1)
+    assert [os.path.basename(path) for path in report_archives.archive_paths(directory)] == ['ct_445.pack']
+
+
+def test_cli(tmpdir, capsys):
+    reports, compressed_resps = make_reports()
+    directory = str(tmpdir.join("archives"))
+    report_archives.write_report_archives(reports, compressed_resps, directory)
+
+    report_archives.main(['--archive-dir', directory, 'list', '--tract', '44.5'])
+    assert capsys.readouterr().out.splitlines() == ['123 Main Street.', '99 Elm St']
+
+    report_archives.main(['--archive-dir', directory, 'print', '12 oak ave'])
+    assert capsys.readouterr().out == reports['12 Oak Avenue'] + "\n"
+
+    output_path = str(tmpdir.join("report.txt"))
+    report_archives.main(['--archive-dir', directory, 'extract', '123 main st', '--output', output_path])
+    with open(output_path) as report_file:
+        assert report_file.read() == reports['123 Main Street.']
+
+    with pytest.raises(SystemExit):
+        report_archives.main(['--archive-dir', directory, 'print', 'nowhere'])
@@ -1,8 +1,10 @@
 import datetime
+import json
 
 import pytest
 
 import report_generator
+import service
 
 
 class MockWorksheet:
@@ -275,3 +277,112 @@ def test_migrate_data_v1():
             'Type of Contact': 'C.A.R.E. Letter',
         },
     ]
+
+
+def test_format_responses_drops_adjacent_responses_without_address():
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'c'],
+        ['',               '10/4/2016 15:09:24', '1'],
+        ['',               '10/4/2016 11:47:55', '2'],
+        ['address_one',    '12/1/2017 06:03:22', '3'],
+        ['',               '12/2/2017 06:03:22', '4'],
+    ])
+
+    formatted_resps = report_generator.format_responses(mock_wks)
+
+    assert [resp['c'] for resp in formatted_resps] == ['3']
+
+
+def test_convert_timestamp():
+    assert report_generator.convert_timestamp('12/1/2017') == datetime.datetime(2017, 12, 1)
+    assert report_generator.convert_timestamp('12/1/2017 06:03:22') == datetime.datetime(2017, 12, 1, 6, 3, 22)
+    assert report_generator.convert_timestamps(['1/2/2016', '1/2/2016', '3/4/2016 1:02:03']) == [
+        datetime.datetime(2016, 1, 2),
+        datetime.datetime(2016, 1, 2),
+        datetime.datetime(2016, 3, 4, 1, 2, 3),
+    ]
+
+    with pytest.raises(ValueError):
+        report_generator.convert_timestamp('not a date')
+
+
+def test_generate_reports_with_alternate_template():
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'How many dogs do they have?', 'Census Tract'],
+        ['address_one',    '10/4/2016 15:09:24', 'Phone Call',      '4',                           '44.5'],
+        ['address_two',    '10/4/2016 11:47:55', 'Phone Call',      '',                            '55.6'],
+    ])
+
+    formatted_resps = report_generator.format_responses(mock_wks)
+    grouped_resps = report_generator.group_responses_by_address(formatted_resps)
+    compressed_resps = report_generator.compress_grouped_responses(grouped_resps)
+    reports = report_generator.generate_reports(grouped_resps, compressed_resps, template=[
+        ["{address} ({census_tract})"],
+        ["Dogs: {num_dogs:>3}", "Emails: {owner_email}"],
+    ])
+
+    assert reports == {
+        'address_one': 'address_one (44.5)\n\nDogs:   4',
+        'address_two': 'address_two (55.6)',
+    }
+
+
+def test_main_runs_against_local_client(tmpdir):
+    rows = [
+        ['Street Address', 'Timestamp',          'Date of Contact',    'Type of Contact', 'How many dogs do they have?', 'Census Tract'],
+        ['address one',    '12/1/2017 06:03:22', '12/1/2017 06:03:22', 'C.A.R.E. Letter', '3',                           '44.5'],
+        ['address two',    '10/4/2016 11:47:55', '10/4/2016 11:47:55', 'Phone Call',      '',                            '55.6'],
+        ['address one',    '10/4/2016 15:09:24', '10/4/2016 15:09:24', 'Phone Call',      '4',                           '44.5'],
+    ]
+
+    def run_main(name, *extra_args):
+        report_generator.main([
+            '--grouped-dir', str(tmpdir.join(name, "grouped")),
+            '--reports-dir', str(tmpdir.join(name, "reports")),
+            '--tract-summary', str(tmpdir.join(name, "tract_summary.csv")),
+            '--snapshot-dir', str(tmpdir.join("snapshots", name)),
+            '--metrics-file', str(tmpdir.join("metrics", name + ".json")),
+        ] + list(extra_args))
+
+    config = service.get_config()
+    try:
+        service.configure(
+            config={
+                'forms_version': 'V1',
+                'main_spreadsheet': {'id': 'responses', 'name': 'Responses'},
+            },
+            backend=lambda: service.LocalClient([
+                service.LocalSpreadsheet('responses', [service.LocalWorksheet([list(row) for row in rows])]),
+            ]),
+        )
+
+        run_main('serial')
+        run_main('sharded', '--jobs', '2')
+    finally:
+        service.configure(config=config, backend=lambda: service.LocalClient([]))
+
+    assert sorted(path.basename for path in tmpdir.join("serial", "reports").listdir()) == ['.manifest.json', 'ct_445', 'ct_556']
+    assert tmpdir.join("serial", "reports", "ct_445", "address_one.txt").read().startswith("Address: address one")
+    assert tmpdir.join("serial", "tract_summary.csv").read().splitlines()[1].startswith("44.5,1,3,")
+    assert tmpdir.join("metrics", "serial.json").check()
+
+    # Sharded runs are dispatched to the worker processes and write the same files
+    from test_streaming import read_tree
+    assert read_tree(str(tmpdir.join("sharded"))) == read_tree(str(tmpdir.join("serial")))
+    assert 'sharded' in json.loads(tmpdir.join("metrics", "sharded.json").read())['stages']
+
+
+@pytest.mark.parametrize('argv', [
+    ['--incremental', '--follow-up-days', '30'],
+    ['--watch', '--follow-up-days', '30'],
+    ['--streaming', '--follow-up-days', '30'],
+    ['--incremental', '--store', 'responses.sqlite3'],
+    ['--watch', '--store', 'responses.sqlite3'],
+    ['--streaming', '--store', 'responses.sqlite3'],
+    ['--incremental', '--summary-sheet'],
+    ['--watch', '--summary-sheet'],
+    ['--streaming', '--summary-sheet'],
+])
+def test_main_rejects_options_unsupported_by_the_mode(argv):
+    with pytest.raises(Exception, match="not supported"):
+        report_generator.main(argv)
@@ -0,0 +1,65 @@
+import datetime
+
+import report_generator
+import response_store
+
+from test_report_generator import MockWorksheet
+
+
+def test_store_queries(tmpdir):
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract', 'Compliance?'],
+        ['address_one',    '10/4/2016 15:09:24', 'Phone Call',      '44.5',         'No'],
+        ['address_two',    '10/4/2016 11:47:55', 'Phone Call',      '55.6',         ''],
+        ['address_one',    '12/1/2017 06:03:22', 'C.A.R.E. Letter', '44.5',         'Yes'],
+        ['address_three',  '12/2/2017 06:03:22', 'Mail/Email',      '44.5',         'No'],
+    ])
+
+    formatted_resps = report_generator.format_responses(mock_wks)
+    compressed_resps = report_generator.compress_grouped_responses(
+        report_generator.group_responses_by_address(formatted_resps)
+    )
+
+    with response_store.ResponseStore(str(tmpdir.join("store.sqlite3"))) as store:
+        # Storing the same responses twice must not duplicate them
+        for _ in range(2):
+            store.upsert_responses(formatted_resps, report_generator.address_extractor)
+            store.upsert_compressed_responses(compressed_resps)
+
+        assert store.non_compliant_addresses() == [('address_three', '44.5'), ('address_two', '55.6')]
+        assert store.non_compliant_addresses('44.5') == [('address_three', '44.5')]
+
+        assert store.contacts(start=datetime.datetime(2017, 1, 1)) == [
+            ('2017-12-01T06:03:22', 'address_one', 'C.A.R.E. Letter', '44.5'),
+            ('2017-12-02T06:03:22', 'address_three', 'Mail/Email', '44.5'),
+        ]
+        assert store.contacts(end=datetime.datetime(2016, 12, 31), contact_type='Phone Call', census_tract='55.6') == [
+            ('2016-10-04T11:47:55', 'address_two', 'Phone Call', '55.6'),
+        ]
+
+
+def test_full_runs_prune_corrected_addresses(tmpdir):
+    def store_run(store, rows):
+        formatted_resps = report_generator.format_responses(MockWorksheet(
+            [['Street Address', 'Timestamp', 'Type of Contact', 'Census Tract', 'Compliance?']] + rows
+        ))
+        compressed_resps = report_generator.compress_grouped_responses(
+            report_generator.group_responses_by_address(formatted_resps)
+        )
+        store.upsert_responses(formatted_resps, report_generator.address_extractor, prune=True)
+        store.upsert_compressed_responses(compressed_resps, prune=True)
+
+    with response_store.ResponseStore(str(tmpdir.join("store.sqlite3"))) as store:
+        store_run(store, [
+            ['123 Main Stret', '10/4/2016 15:09:24', 'Phone Call', '44.5', 'No'],
+            ['456 Elm Ave',    '10/5/2016 15:09:24', 'Phone Call', '44.5', 'No'],
+        ])
+
+        # The typo is fixed and the address is also spelled differently
+        store_run(store, [
+            ['123 Main Street', '10/4/2016 15:09:24', 'Phone Call', '44.5', 'No'],
+            ['456 elm avenue',  '10/5/2016 15:09:24', 'Phone Call', '44.5', 'No'],
+        ])
+
+        assert store.non_compliant_addresses('44.5') == [('123 Main Street', '44.5'), ('456 elm avenue', '44.5')]
+        assert [row[1] for row in store.contacts()] == ['123 Main Street', '456 elm avenue']
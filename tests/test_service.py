@@ -0,0 +1,23 @@
+import service
+
+
+def test_client_is_created_lazily_and_reused():
+    created_clients = []
+
+    def backend():
+        created_clients.append(service.LocalClient([
+            service.LocalSpreadsheet('key', [service.LocalWorksheet([['a'], ['1']], title='Sheet1')]),
+        ]))
+        return created_clients[-1]
+
+    config = service.get_config()
+    try:
+        service.configure(backend=backend)
+        assert created_clients == []
+
+        spreadsheet = service.open_spreadsheet('key')
+        assert service.open_spreadsheet('key') is spreadsheet
+        assert spreadsheet.worksheet('Sheet1').get_all_values() == [['a'], ['1']]
+        assert len(created_clients) == 1
+    finally:
+        service.configure(config=config, backend=lambda: service.LocalClient([]))
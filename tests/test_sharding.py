@@ -0,0 +1,64 @@
+import report_generator
+import sharding
+import tract_rollups
+
+from test_report_generator import MockWorksheet
+from test_streaming import read_tree
+
+
+def test_sharded_run_matches_serial_pipeline(tmpdir):
+    data = [
+        ['Street Address', 'Timestamp',          'Type of Contact', 'How many dogs do they have?', 'Census Tract'],
+        ['address one',    '12/1/2017 06:03:22', 'C.A.R.E. Letter', '3',                           '44.5'],
+        ['address two',    '10/4/2016 11:47:55', 'Phone Call',      '',                            '55.6'],
+        ['',               '10/5/2016 11:47:55', 'Phone Call',      '',                            '55.6'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '4',                           '44.5'],
+        ['address three',  '10/6/2016 11:47:55', 'Initial Contact', '1',                           '55.6'],
+        ['address four',   '10/7/2016 11:47:55', 'Mail/Email',      '2',                           '66.7'],
+    ]
+
+    rollup = tract_rollups.TractRollup()
+    grouped_resps = report_generator.group_responses_by_address(
+        report_generator.format_responses(MockWorksheet([list(row) for row in data]))
+    )
+    compressed_resps = report_generator.compress_grouped_responses(grouped_resps, rollup)
+    reports = report_generator.generate_reports(grouped_resps, compressed_resps)
+    report_generator.write_grouped_resps_to_disk(grouped_resps, str(tmpdir.join("serial", "grouped")))
+    report_generator.write_reports_to_disk(reports, compressed_resps, str(tmpdir.join("serial", "reports")))
+    rollup.write_csv(str(tmpdir.join("serial", "tract_summary.csv")))
+
+    num_addresses = sharding.run_sharded(
+        [MockWorksheet([list(row) for row in data])],
+        jobs=3,
+        grouped_directory=str(tmpdir.join("sharded", "grouped")),
+        reports_directory=str(tmpdir.join("sharded", "reports")),
+        tract_summary_path=str(tmpdir.join("sharded", "tract_summary.csv")),
+    )
+
+    assert num_addresses == 4
+    assert read_tree(str(tmpdir.join("sharded"))) == read_tree(str(tmpdir.join("serial")))
+
+
+def test_sharded_run_removes_files_of_moved_addresses(tmpdir):
+    data = [
+        ['Street Address', 'Timestamp',          'Type of Contact', 'How many dogs do they have?', 'Census Tract'],
+        ['address one',    '12/1/2017 06:03:22', 'C.A.R.E. Letter', '3',                           '44.5'],
+        ['address two',    '10/4/2016 11:47:55', 'Phone Call',      '',                            '55.6'],
+    ]
+    reports_directory = str(tmpdir.join("reports"))
+
+    def run(rows):
+        sharding.run_sharded(
+            [MockWorksheet([list(row) for row in rows])],
+            jobs=2,
+            grouped_directory=str(tmpdir.join("grouped")),
+            reports_directory=reports_directory,
+            tract_summary_path=str(tmpdir.join("tract_summary.csv")),
+        )
+
+    run(data)
+    assert sorted(read_tree(reports_directory)) == ['.manifest.json', 'ct_445/address_one.txt', 'ct_556/address_two.txt']
+
+    # `address one` moved census tract
+    run(data + [['address one', '12/2/2017 06:03:22', 'Phone Call', '3', '55.6']])
+    assert sorted(read_tree(reports_directory)) == ['.manifest.json', 'ct_556/address_one.txt', 'ct_556/address_two.txt']
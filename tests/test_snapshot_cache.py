@@ -0,0 +1,37 @@
+import report_generator
+import snapshot_cache
+
+from test_report_generator import MockWorksheet
+
+
+def test_cached_worksheet_reuses_fresh_snapshot(tmpdir):
+    directory = str(tmpdir)
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'c'],
+        ['address_one',    '10/4/2016 15:09:24', '1'],
+    ])
+
+    cached_wks = snapshot_cache.cached_worksheet(mock_wks, 'sheet-id', 0, directory=directory)
+    assert cached_wks.get_all_values() == mock_wks.get_all_values()
+
+    # A fresh snapshot is served even though the live worksheet has changed
+    mock_wks._data.append(['address_two', '10/4/2016 11:47:55', '2', '10/4/2016 11:47:55'])
+    cached_wks = snapshot_cache.cached_worksheet(mock_wks, 'sheet-id', 0, max_age=60, directory=directory)
+    assert len(cached_wks.get_all_values()) == 2
+
+    # A stale snapshot is fetched again
+    cached_wks = snapshot_cache.cached_worksheet(mock_wks, 'sheet-id', 0, max_age=-1, directory=directory)
+    assert len(cached_wks.get_all_values()) == 3
+
+
+def test_offline_worksheet_replays_snapshot(tmpdir):
+    directory = str(tmpdir)
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'c'],
+        ['address_one',    '10/4/2016 15:09:24', '1'],
+    ])
+
+    snapshot_cache.cached_worksheet(mock_wks, 'sheet-id', 0, directory=directory)
+    offline_wks = snapshot_cache.offline_worksheet('sheet-id', 0, directory=directory)
+
+    assert report_generator.format_responses(offline_wks) == report_generator.format_responses(mock_wks)
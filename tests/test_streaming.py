@@ -0,0 +1,47 @@
+import os
+
+import report_generator
+import streaming
+
+from test_report_generator import MockWorksheet
+
+
+def read_tree(directory):
+    tree = {}
+    for dir_path, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            with open(os.path.join(dir_path, file_name)) as f:
+                tree[os.path.relpath(os.path.join(dir_path, file_name), directory)] = f.read()
+
+    return tree
+
+
+def test_stream_reports_matches_batch_pipeline(tmpdir):
+    data = [
+        ['Street Address', 'Timestamp',          'Type of Contact', 'How many dogs do they have?', 'Census Tract'],
+        ['address one',    '12/1/2017 06:03:22', 'C.A.R.E. Letter', '3',                           '44.5'],
+        ['address two',    '10/4/2016 11:47:55', 'Phone Call',      '',                            '55.6'],
+        ['',               '10/5/2016 11:47:55', 'Phone Call',      '',                            '55.6'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '4',                           '44.5'],
+        ['address three',  '10/6/2016 11:47:55', 'Initial Contact', '1',                           '55.6'],
+    ]
+
+    batch_wks = MockWorksheet([list(row) for row in data])
+    grouped_resps = report_generator.group_responses_by_address(report_generator.format_responses(batch_wks))
+    compressed_resps = report_generator.compress_grouped_responses(grouped_resps)
+    reports = report_generator.generate_reports(grouped_resps, compressed_resps)
+    report_generator.write_grouped_resps_to_disk(grouped_resps, str(tmpdir.join("batch", "grouped")))
+    report_generator.write_reports_to_disk(reports, compressed_resps, str(tmpdir.join("batch", "reports")))
+
+    # Tiny pages and runs force several fetches and spills
+    num_addresses = streaming.stream_reports(
+        [MockWorksheet([list(row) for row in data[:3]]), MockWorksheet([list(data[0])] + [list(row) for row in data[3:]])],
+        page_size=2,
+        run_size=2,
+        grouped_directory=str(tmpdir.join("streamed", "grouped")),
+        reports_directory=str(tmpdir.join("streamed", "reports")),
+        tract_summary_path=str(tmpdir.join("tract_summary.csv")),
+    )
+
+    assert num_addresses == 3
+    assert read_tree(str(tmpdir.join("streamed"))) == read_tree(str(tmpdir.join("batch")))
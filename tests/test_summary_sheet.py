@@ -0,0 +1,52 @@
+import contact_history
+import report_generator
+import service
+import summary_sheet
+
+from test_report_generator import MockWorksheet
+
+
+class RecordingWorksheet(service.LocalWorksheet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def batch_update(self, data):
+        self.batches.append(data)
+        super().batch_update(data)
+
+
+def summarize(data):
+    history = contact_history.ContactHistory()
+    grouped_resps = report_generator.group_responses_by_address(
+        report_generator.format_responses(MockWorksheet(data)), history,
+    )
+
+    return summary_sheet.build_summary_rows(report_generator.compress_grouped_responses(grouped_resps), history)
+
+
+def test_write_summary_only_sends_changed_rows():
+    data = [
+        ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract', 'Compliance?'],
+        ['address_one',    '10/4/2016 15:09:24', 'Phone Call',      '44.5',         'No'],
+        ['address_two',    '10/4/2016 11:47:55', 'Initial Contact', '55.6',         ''],
+        ['address_three',  '12/1/2017 06:03:22', 'Phone Call',      '44.5',         'Yes'],
+    ]
+
+    summary_wks = RecordingWorksheet([[] for _ in range(2)], title=summary_sheet.DEFAULT_SUMMARY_TITLE)
+
+    assert summary_sheet.write_summary(summary_wks, summarize([list(row) for row in data])) == 4
+    assert len(summary_wks.batches) == 1
+    assert summary_wks.get_all_values()[1] == [
+        'address_one', '44.5', '', '', '10/04/16', '1', '1', '0', '', '', '', '', '', 'No',
+    ]
+
+    # Nothing changed, nothing is sent
+    assert summary_sheet.write_summary(summary_wks, summarize([list(row) for row in data])) == 0
+    assert len(summary_wks.batches) == 1
+
+    # Only the row of `address_two` changed, and the row of the removed `address_three` is cleared
+    data[2][4] = 'Yes'
+    assert summary_sheet.write_summary(summary_wks, summarize([list(row) for row in data[:3]]), batch_size=1) == 2
+    assert [update['range'] for batch in summary_wks.batches[1:] for update in batch] == ['A3:N3', 'A4:N4']
+    assert summary_wks.get_all_values()[3] == [''] * len(summary_sheet.SUMMARY_HEADER)
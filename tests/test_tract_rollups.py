@@ -0,0 +1,40 @@
+import report_generator
+import tract_rollups
+
+from test_report_generator import MockWorksheet
+
+
+def test_rollup_is_built_while_compressing_and_updated_incrementally(tmpdir):
+    mock_wks = MockWorksheet([
+        [
+            'Street Address', 'Timestamp', 'Census Tract',
+            'How many dogs do they have?', 'How many cats do they have?', 'Compliance?',
+        ],
+        ['address_one',   '10/4/2016 15:09:24', '44.5', '2', '1', 'Yes'],
+        ['address_two',   '10/4/2016 11:47:55', '44.5', '1', '',  'No'],
+        ['address_three', '12/1/2017 06:03:22', '55.6', '',  '2', ''],
+    ])
+
+    rollup = tract_rollups.TractRollup()
+    compressed_resps = report_generator.compress_grouped_responses(
+        report_generator.group_responses_by_address(report_generator.format_responses(mock_wks)), rollup,
+    )
+
+    assert rollup.summary_rows() == [
+        ['44.5', 2, 3, 1, 3, 3, 3, 1, '0.500'],
+        ['55.6', 1, 0, 2, 0, 0, 0, 0, '0.000'],
+    ]
+
+    # `address_two` moved census tract
+    rollup = tract_rollups.TractRollup.from_state(rollup.to_state())
+    rollup.update('address_two', dict(compressed_resps['address_two'], **{'Census Tract': '55.6'}))
+
+    assert rollup.summary_rows() == [
+        ['44.5', 1, 2, 1, 3, 3, 3, 1, '1.000'],
+        ['55.6', 2, 1, 2, 0, 0, 0, 0, '0.000'],
+    ]
+
+    summary_path = str(tmpdir.join("tract_summary.csv"))
+    rollup.write_csv(summary_path)
+    with open(summary_path) as summary_file:
+        assert summary_file.readline().strip() == ",".join(tract_rollups.SUMMARY_HEADER)
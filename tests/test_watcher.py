@@ -0,0 +1,143 @@
+import json
+import threading
+
+import metrics
+import watcher
+
+from test_incremental_sync import append_row
+from test_paged_reader import StaleWorksheet
+from test_report_generator import MockWorksheet
+
+
+def make_watcher(tmpdir, mock_wks, **kwargs):
+    return watcher.Watcher(
+        mock_wks,
+        str(tmpdir.join("state.json")),
+        health_path=str(tmpdir.join("health.json")),
+        grouped_directory=str(tmpdir.join("grouped")),
+        reports_directory=str(tmpdir.join("reports")),
+        tract_summary_path=str(tmpdir.join("tract_summary.csv")),
+        **kwargs
+    )
+
+
+def read_health(tmpdir):
+    with open(str(tmpdir.join("health.json"))) as health_file:
+        return json.loads(health_file.read())
+
+
+def test_polls_only_regenerate_new_responses(tmpdir):
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+        ['address two',    '10/4/2016 11:47:55', 'Phone Call',      '55.6'],
+    ])
+    responses_watcher = make_watcher(tmpdir, mock_wks, poll_interval=0)
+
+    assert responses_watcher.poll() == {'address one', 'address two'}
+    assert responses_watcher.poll() == set()
+
+    append_row(mock_wks, ['address two', '12/1/2017 06:03:22', 'C.A.R.E. Letter', '55.6'])
+
+    responses_watcher.run(max_polls=1)
+
+    health = read_health(tmpdir)
+    assert health['status'] == 'stopped'
+    assert health['polls'] == 3
+    assert health['addresses_regenerated'] == 3
+    assert health['row_count'] == 3
+    assert health['metrics']['stages']['poll']['calls'] == 3
+
+    # A restarted watcher picks up from the saved state
+    assert make_watcher(tmpdir, mock_wks).poll() == set()
+
+
+def test_failed_polls_are_reported_and_retried(tmpdir):
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+    ])
+    responses_watcher = make_watcher(tmpdir, mock_wks, poll_interval=0)
+
+    polls = []
+    poll = responses_watcher.poll
+
+    def flaky_poll():
+        polls.append(len(polls))
+        if len(polls) == 1:
+            raise Exception("Sheets API unavailable")
+        if len(polls) == 2:
+            assert read_health(tmpdir)['status'] == 'error'
+
+        return poll()
+
+    responses_watcher.poll = flaky_poll
+    responses_watcher.run(max_polls=2)
+
+    health = read_health(tmpdir)
+    assert health['failed_polls'] == 1
+    assert health['polls'] == 1
+    assert health['last_error'] is None
+
+
+def test_stop_ends_the_watch_loop(tmpdir):
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+    ])
+    responses_watcher = make_watcher(tmpdir, mock_wks, poll_interval=60)
+
+    watch_thread = threading.Thread(target=responses_watcher.run)
+    watch_thread.start()
+    responses_watcher.stop()
+    watch_thread.join(5)
+
+    assert not watch_thread.is_alive()
+    assert read_health(tmpdir)['status'] == 'stopped'
+
+
+def test_polls_read_rows_past_the_row_count_the_worksheet_was_opened_with(tmpdir):
+    rows = [
+        ['Street Address', 'Timestamp',          'Date of Contact',    'Type of Contact', 'Census Tract'],
+        ['address 0',      '10/4/2016 15:09:24', '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+        ['address 1',      '10/4/2016 15:09:24', '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+    ]
+    stale_wks = StaleWorksheet(rows)
+    metrics.reset()
+    responses_watcher = make_watcher(tmpdir, stale_wks, page_size=3)
+
+    assert responses_watcher.poll() == {'address 0', 'address 1'}
+
+    # More rows than fit in a page are appended, past the cached row count
+    rows.extend(
+        ['address {0}'.format(idx), '10/5/2016 15:09:24', '10/5/2016 15:09:24', 'Phone Call', '44.5']
+        for idx in range(2, 9)
+    )
+
+    assert responses_watcher.poll() == set('address {0}'.format(idx) for idx in range(2, 9))
+    assert responses_watcher.poll() == set()
+
+    assert responses_watcher.health['row_count'] == 9
+    assert 'full_rebuilds' not in metrics.current().counters
+
+
+def test_poll_failing_inside_sync_is_retried(tmpdir):
+    mock_wks = MockWorksheet([
+        ['Street Address', 'Timestamp',          'Type of Contact', 'Census Tract'],
+        ['address one',    '10/4/2016 15:09:24', 'Phone Call',      '44.5'],
+    ])
+    responses_watcher = make_watcher(tmpdir, mock_wks, poll_interval=0)
+    assert responses_watcher.poll() == {'address one'}
+
+    append_row(mock_wks, ['address two', 'bad date', 'Phone Call', '55.6'])
+
+    responses_watcher.run(max_polls=1)
+    assert read_health(tmpdir)['failed_polls'] == 1
+    assert responses_watcher.state['row_count'] == 1
+    assert responses_watcher.state['rows_by_address'].keys() == {'address one'}
+
+    # Once the timestamp is corrected, the next poll picks up the row again
+    mock_wks._data[-1] = ['address two', '10/5/2016 15:09:24', 'Phone Call', '55.6', '10/5/2016 15:09:24']
+
+    assert responses_watcher.poll() == {'address two'}
+    assert tmpdir.join("reports", "ct_556", "address_two.txt").check()
@@ -0,0 +1,111 @@
+import csv
+import os
+
+import address_index
+
+
+DEFAULT_SUMMARY_PATH = os.path.abspath("./reports/tract_summary.csv")
+
+# Totals kept for each census tract, with the compressed response field each is summed from
+COUNTED_FIELDS = [
+    ('dogs', 'How many dogs do they have?'),
+    ('cats', 'How many cats do they have?'),
+    ('fixed_animals', 'Spayed/Neutered?'),
+    ('vaccinated_animals', 'Vaccinated?'),
+    ('registered_animals', 'Registered?'),
+]
+
+SUMMARY_HEADER = (
+    ['census_tract', 'addresses']
+    + [name for name, _ in COUNTED_FIELDS]
+    + ['compliant_addresses', 'compliance_rate']
+)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class TractRollup:
+    """Census tract totals, updated one compressed response at a time
+
+    The contribution of each address is remembered, so updating an address that changed or moved
+    census tract only adjusts the affected totals. Contributions are keyed by canonical address, so
+    any spelling of an address replaces its contribution.
+    """
+
+    def __init__(self):
+        # Address to [census tract, compliant, counted field values...]
+        self.contributions = {}
+        # Census tract to [addresses, compliant addresses, counted field totals...]
+        self.totals = {}
+
+    def _apply(self, contribution, sign):
+        census_tract = contribution[0]
+        totals = self.totals.setdefault(census_tract, [0] * (len(COUNTED_FIELDS) + 2))
+
+        totals[0] += sign
+        for idx, value in enumerate(contribution[1:]):
+            totals[idx + 1] += sign * value
+
+        if totals[0] == 0:
+            del self.totals[census_tract]
+
+    def update(self, address, compressed_resp):
+        """Adds or replaces the contribution of an address
+
+        @param address The address
+        @param compressed_resp The compressed response of the address
+        """
+        address = address_index.canonical_address(address)
+        self.remove(address)
+
+        contribution = [
+            compressed_resp.get('Census Tract'),
+            1 if compressed_resp.get('Compliance?') == 'Yes' else 0,
+        ] + [_to_int(compressed_resp.get(field)) for _, field in COUNTED_FIELDS]
+
+        self.contributions[address] = contribution
+        self._apply(contribution, 1)
+
+    def remove(self, address):
+        contribution = self.contributions.pop(address_index.canonical_address(address), None)
+        if contribution is not None:
+            self._apply(contribution, -1)
+
+    def summary_rows(self):
+        """Builds one row per census tract, in `SUMMARY_HEADER` order and sorted by census tract"""
+        rows = []
+        for census_tract in sorted(self.totals, key=lambda census_tract: census_tract or ''):
+            num_addresses, num_compliant = self.totals[census_tract][:2]
+            rows.append(
+                [census_tract or '', num_addresses]
+                + self.totals[census_tract][2:]
+                + [num_compliant, "{0:.3f}".format(num_compliant / num_addresses)]
+            )
+
+        return rows
+
+    def write_csv(self, path=DEFAULT_SUMMARY_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'w', newline='') as summary_file:
+            writer = csv.writer(summary_file)
+            writer.writerow(SUMMARY_HEADER)
+            writer.writerows(self.summary_rows())
+
+    def to_state(self):
+        return self.contributions
+
+    @classmethod
+    def from_state(cls, contributions):
+        rollup = cls()
+        for address, contribution in contributions.items():
+            rollup.contributions[address] = contribution
+            rollup._apply(contribution, 1)
+
+        return rollup
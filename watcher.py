@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+import disk_writer
+import incremental_sync
+import metrics
+import paged_reader
+import tract_rollups
+
+logger = logging.getLogger("das-care-contact-forms-logger")
+
+DEFAULT_POLL_INTERVAL = 30.0
+DEFAULT_HEALTH_PATH = os.path.abspath("./reports/watch_health.json")
+
+
+class Watcher:
+    """Keeps the reports of a worksheet up to date from a long-running process
+
+    The client, the raw rows of every address and the census tract totals stay in memory between
+    polls, so each poll only reads the rows appended since the previous one and regenerates the
+    reports of the addresses they touch.
+    """
+
+    def __init__(
+        self,
+        responses_wks,
+        state_path,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        health_path=DEFAULT_HEALTH_PATH,
+        grouped_directory=os.path.abspath("./grouped_responses/"),
+        reports_directory=os.path.abspath("./reports/reports_by_address/"),
+        tract_summary_path=tract_rollups.DEFAULT_SUMMARY_PATH,
+        forms_version=None,
+        page_size=paged_reader.DEFAULT_PAGE_SIZE,
+        full_rebuild=False,
+        rebuild_interval=incremental_sync.DEFAULT_REBUILD_INTERVAL,
+    ):
+        """
+        @param responses_wks The worksheet to watch
+        @param state_path Where the sync state is saved, so a restarted watcher starts warm
+        @param poll_interval The number of seconds between the start of two polls
+        @param health_path Where the health and metrics of the watcher are written as JSON
+        @param grouped_directory Where the grouped responses are written
+        @param reports_directory Where the reports are written
+        @param tract_summary_path Where the census tract totals are written
+        @param forms_version The name of the forms version of the worksheet, defaults to the config's
+        @param page_size The number of rows fetched per request
+        @param full_rebuild Whether the first poll re-reads every row and rebuilds every report
+        @param rebuild_interval The number of seconds after which a poll does a full rebuild, never if `None`
+        """
+        self.responses_wks = responses_wks
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.health_path = health_path
+        self.sync_options = dict(
+            grouped_directory=grouped_directory,
+            reports_directory=reports_directory,
+            tract_summary_path=tract_summary_path,
+            forms_version=forms_version,
+            page_size=page_size,
+            rebuild_interval=rebuild_interval,
+        )
+        self.full_rebuild_pending = full_rebuild
+
+        self.state = incremental_sync.load_state(state_path)
+        self._stop_event = threading.Event()
+
+        self.health = {
+            'status': 'starting',
+            'pid': os.getpid(),
+            'started_at': time.time(),
+            'last_poll_at': None,
+            'last_change_at': None,
+            'last_poll_seconds': None,
+            'last_error': None,
+            'polls': 0,
+            'failed_polls': 0,
+            'addresses_regenerated': 0,
+            'row_count': self.state['row_count'] if self.state else 0,
+        }
+
+    def poll(self):
+        """Syncs the reports with the rows appended since the previous poll
+
+        @return Set of addresses whose reports were regenerated
+        """
+        previous_state = self.state
+        previous_watermark = (previous_state['row_count'], previous_state.get('rebuilt_at')) if previous_state else None
+
+        start = time.perf_counter()
+        with metrics.stage('poll'):
+            self.state, touched_addresses = incremental_sync.sync_state(
+                self.responses_wks, previous_state, full_rebuild=self.full_rebuild_pending, **self.sync_options
+            )
+        self.full_rebuild_pending = False
+
+        # The state file is only rewritten when rows were consumed or every report was rebuilt
+        if (self.state['row_count'], self.state.get('rebuilt_at')) != previous_watermark:
+            incremental_sync.save_state(self.state, self.state_path)
+
+        now = time.time()
+        self.health['polls'] += 1
+        self.health['last_poll_at'] = now
+        self.health['last_poll_seconds'] = time.perf_counter() - start
+        self.health['row_count'] = self.state['row_count']
+        if touched_addresses:
+            self.health['last_change_at'] = now
+            self.health['addresses_regenerated'] += len(touched_addresses)
+        metrics.count('addresses_regenerated', len(touched_addresses))
+
+        return touched_addresses
+
+    def write_health(self):
+        if os.path.dirname(self.health_path):
+            os.makedirs(os.path.dirname(self.health_path), exist_ok=True)
+
+        health = dict(self.health, metrics=metrics.current().summary())
+        disk_writer.write_file_atomically(self.health_path, json.dumps(health, indent=2, sort_keys=True))
+
+    def run(self, max_polls=None):
+        """Polls the worksheet until stopped
+
+        A failed poll is logged and reported in the health file, the next poll retries it.
+
+        @param max_polls Stop after this many polls, polls forever by default
+        """
+        logger.info("Watching for new responses every %.1fs" % self.poll_interval)
+
+        num_polls = 0
+        while not self._stop_event.is_set():
+            poll_started_at = time.time()
+            try:
+                self.poll()
+                self.health['status'] = 'ok'
+                self.health['last_error'] = None
+            except Exception as error:
+                logger.exception("Poll failed, retrying in %.1fs" % self.poll_interval)
+                self.health['status'] = 'error'
+                self.health['failed_polls'] += 1
+                self.health['last_error'] = repr(error)
+
+            self.write_health()
+
+            num_polls += 1
+            if max_polls is not None and num_polls >= max_polls:
+                break
+
+            self._stop_event.wait(max(0, self.poll_interval - (time.time() - poll_started_at)))
+
+        self.health['status'] = 'stopped'
+        self.write_health()
+        logger.info("Stopped watching for new responses")
+
+    def stop(self):
+        """Asks the watcher to stop once the current poll is done"""
+        self._stop_event.set()
+
+    def install_signal_handlers(self):
+        """Stops the watcher gracefully on SIGINT and SIGTERM"""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: self.stop())